@@ -3,6 +3,7 @@ Configuration management for the Cancellations SOP Processor
 """
 
 import os
+from functools import lru_cache
 from typing import Any, Dict, List
 
 from dotenv import load_dotenv
@@ -31,8 +32,13 @@ class Config:
 
     # Output settings
     OUTPUT_DIRECTORY = os.getenv("OUTPUT_DIRECTORY", "processed_reports")
-    ENABLE_EXCEL_EXPORT = os.getenv("ENABLE_EXCEL_EXPORT", "true").lower() == "true"
+    # Processed data is written as Parquet/JSON; XLSX is an opt-in extra
+    ENABLE_EXCEL_EXPORT = os.getenv("ENABLE_EXCEL_EXPORT", "false").lower() == "true"
     ENABLE_CSV_EXPORT = os.getenv("ENABLE_CSV_EXPORT", "true").lower() == "true"
+    # Parsed uploads are kept here as Parquet, keyed on their content hash, so
+    # re-uploading the same report skips parsing across sessions and restarts.
+    # Empty disables it: the cache holds copies of the uploaded report data
+    REPORT_CACHE_DIRECTORY = os.getenv("REPORT_CACHE_DIRECTORY", "")
 
     # Logging settings
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -44,8 +50,14 @@ class Config:
 
     # Processing settings
     BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
+    # Uploads above this size are summarized from only the columns they need;
+    # CSV uploads are also aggregated in CHUNK_SIZE-row chunks
+    STREAM_THRESHOLD_MB = int(os.getenv("STREAM_THRESHOLD_MB", "50"))
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "100000"))
     ENABLE_VALIDATION = os.getenv("ENABLE_VALIDATION", "true").lower() == "true"
     ENABLE_BACKUP = os.getenv("ENABLE_BACKUP", "true").lower() == "true"
+    # Use the calamine (xlsx) and pyarrow (csv) readers when installed
+    FAST_IO = os.getenv("FAST_IO", "true").lower() == "true"
 
     # Report-specific settings
     RPT600_SETTINGS = {
@@ -73,8 +85,9 @@ class Config:
             return {}
 
     @classmethod
+    @lru_cache(maxsize=1)
     def validate_config(cls) -> List[str]:
-        """Validate configuration and return any errors"""
+        """Validate configuration and return any errors (checked once)"""
         errors = []
 
         # Check required directories
@@ -92,6 +105,14 @@ class Config:
         if cls.BATCH_SIZE <= 0:
             errors.append("BATCH_SIZE must be positive")
 
+        # Validate streaming threshold
+        if cls.STREAM_THRESHOLD_MB <= 0:
+            errors.append("STREAM_THRESHOLD_MB must be positive")
+
+        # Validate streaming chunk size
+        if cls.CHUNK_SIZE <= 0:
+            errors.append("CHUNK_SIZE must be positive")
+
         # Validate server port
         if not (1024 <= cls.SERVER_PORT <= 65535):
             errors.append("SERVER_PORT must be between 1024 and 65535")
@@ -2,70 +2,166 @@
 Main Streamlit application for RPT 600 and RPT 908 SOP processing
 """
 
+import hashlib
 import logging
-import os
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 # Use absolute imports for Streamlit Cloud deployment
 try:
     from config import config
-    from utils import create_output_directory, format_currency, setup_logging
+    from utils import (
+        EXCEL_WRITER_ENGINE,
+        EXCEL_WRITER_KWARGS,
+        HAS_PYARROW,
+        ReportSource,
+        create_output_directory,
+        date_bounds,
+        format_currency,
+        inspect_report,
+        iter_report_chunks,
+        load_cached_report,
+        read_report,
+        read_report_header,
+        save_processing_summary,
+        setup_logging,
+        sniff_report_format,
+        store_cached_report,
+        sum_amounts,
+        write_parquet,
+    )
 except ImportError:
     # Fallback for local development
     from .config import config
-    from .utils import create_output_directory, format_currency, setup_logging
+    from .utils import (
+        EXCEL_WRITER_ENGINE,
+        EXCEL_WRITER_KWARGS,
+        HAS_PYARROW,
+        ReportSource,
+        create_output_directory,
+        date_bounds,
+        format_currency,
+        inspect_report,
+        iter_report_chunks,
+        load_cached_report,
+        read_report,
+        read_report_header,
+        save_processing_summary,
+        setup_logging,
+        sniff_report_format,
+        store_cached_report,
+        sum_amounts,
+        write_parquet,
+    )
 
 # Configure logging
 setup_logging(config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-# Page configuration
-st.set_page_config(
-    page_title=config.APP_NAME,
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded",
-)
+
+# RPT600 typically has payee-related columns
+_RPT600_INDICATORS = frozenset({"payee", "commission", "dealer", "fee"})
+# RPT908 typically has cancellation-related columns
+_RPT908_INDICATORS = frozenset({"cancellation", "cancel", "termination", "refund"})
+
+
+@lru_cache(maxsize=128)
+def _indicator_scores(columns: Tuple[Any, ...]) -> Tuple[int, int]:
+    """Count the RPT600 and RPT908 indicators found in any column name"""
+    # One lowercase pass; newlines keep matches from spanning two columns
+    names = "\n".join(str(col) for col in columns).lower()
+    return (
+        sum(indicator in names for indicator in _RPT600_INDICATORS),
+        sum(indicator in names for indicator in _RPT908_INDICATORS),
+    )
+
+
+# Keywords that pick each summary column by name, first match wins
+_SUMMARY_KEYWORDS = {
+    "date": ("date", "time"),
+    "amount": ("amount", "commission", "fee"),
+    "reason": ("reason", "cause"),
+    "refund": ("refund", "amount"),
+}
+
+
+# Saves run here when requested in the background; one writer thread keeps
+# them in submission order
+_SAVE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sop-save")
 
 
 class ReportProcessor:
     """Handles processing of RPT 600 and RPT 908 reports"""
 
-    def __init__(self):
-        self.supported_reports = ["RPT600", "RPT908"]
-        self.processed_reports = []
-
-    def validate_report(self, file_path: str) -> Dict[str, Any]:
-        """Validate uploaded report file"""
+    SUPPORTED_REPORTS = ("RPT600", "RPT908")
+    # Processing history kept per session; older entries are dropped
+    MAX_HISTORY = 200
+    # Rows of each report shown as a preview
+    PREVIEW_ROWS = 50
+
+    def __init__(self) -> None:
+        self.processed_reports: Deque[Dict[str, Any]] = deque(maxlen=self.MAX_HISTORY)
+        self._history_df: Optional[pd.DataFrame] = None
+        self._output_dirs: Dict[str, Path] = {}
+        self._pending_saves: Set[Future[None]] = set()
+        self._failed_saves: Deque[str] = deque(maxlen=self.MAX_HISTORY)
+        self._saves_lock = threading.Lock()
+
+    def validate_report(
+        self, source: ReportSource, file_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Validate uploaded report file (a path or an open binary file)"""
         try:
             # Check file extension
-            if file_path.endswith(".csv"):
-                df = pd.read_csv(file_path)
-            elif file_path.endswith(".xlsx"):
-                df = pd.read_excel(file_path)
-            else:
+            file_name = file_name or getattr(source, "name", source)
+            if not file_name.endswith((".csv", ".xlsx")):
                 return {
                     "valid": False,
-                    "error": "Unsupported file format. Please upload CSV or Excel files.",
+                    "error": (
+                        "Unsupported file format. Please upload CSV or Excel files."
+                    ),
                 }
 
+            # Catch mislabeled files before a parser fails on them
+            actual_format = sniff_report_format(source)
+            if not file_name.endswith(f".{actual_format}"):
+                return {
+                    "valid": False,
+                    "error": (
+                        f"File content is {actual_format.upper()}, "
+                        "which does not match its extension."
+                    ),
+                }
+
+            # Only the header and a row count are needed to validate
+            df, row_count = inspect_report(source, file_name, fast_io=config.FAST_IO)
+
             # Basic validation
-            if df.empty:
+            if row_count == 0:
                 return {"valid": False, "error": "File appears to be empty"}
 
             # Check for required columns based on report type
             report_type = self.detect_report_type(df)
             if not report_type:
-                return {"valid": False, "error": "Could not determine report type"}
+                return {
+                    "valid": False,
+                    "error": "Could not determine report type",
+                    "columns": list(df.columns),
+                }
 
             return {
                 "valid": True,
                 "report_type": report_type,
-                "row_count": len(df),
+                "row_count": row_count,
                 "columns": list(df.columns),
             }
 
@@ -75,23 +171,9 @@ class ReportProcessor:
 
     def detect_report_type(self, df: pd.DataFrame) -> Optional[str]:
         """Detect if this is RPT600 or RPT908 based on column structure"""
-        columns = [col.lower() for col in df.columns]
-
-        # RPT600 typically has payee-related columns
-        rpt600_indicators = ["payee", "commission", "dealer", "fee"]
-        # RPT908 typically has cancellation-related columns
-        rpt908_indicators = ["cancellation", "cancel", "termination", "refund"]
+        rpt600_score, rpt908_score = _indicator_scores(tuple(df.columns))
 
-        rpt600_score = sum(
-            1
-            for indicator in rpt600_indicators
-            if any(indicator in col for col in columns)
-        )
-        rpt908_score = sum(
-            1
-            for indicator in rpt908_indicators
-            if any(indicator in col for col in columns)
-        )
+        logger.debug("RPT600 score: %d, RPT908 score: %d", rpt600_score, rpt908_score)
 
         if rpt600_score > rpt908_score:
             return "RPT600"
@@ -104,55 +186,40 @@ class ReportProcessor:
         """Process RPT600 Payee Statement report"""
         try:
             # Extract key information
+            picked = self._pick_columns(list(df.columns))
             summary = {
                 "total_records": len(df),
                 "unique_payees": (
-                    df.get("Payee", df.get("Payee Number", pd.Series())).nunique()
-                    if "Payee" in df.columns or "Payee Number" in df.columns
-                    else 0
+                    df[picked["payee"]].nunique() if picked["payee"] else 0
                 ),
                 "unique_dealers": (
-                    df.get("Dealer", df.get("Dealer Number", pd.Series())).nunique()
-                    if "Dealer" in df.columns or "Dealer Number" in df.columns
-                    else 0
+                    df[picked["dealer"]].nunique() if picked["dealer"] else 0
                 ),
                 "date_range": None,
                 "total_amount": 0,
             }
 
-            # Try to find date columns and amount columns
-            date_cols = [
-                col
-                for col in df.columns
-                if "date" in col.lower() or "time" in col.lower()
-            ]
-            amount_cols = [
-                col
-                for col in df.columns
-                if "amount" in col.lower()
-                or "commission" in col.lower()
-                or "fee" in col.lower()
-            ]
-
-            if date_cols:
+            if picked["date"]:
                 try:
-                    dates = pd.to_datetime(df[date_cols[0]], errors="coerce")
+                    lo, hi = date_bounds(df[picked["date"]])
                     summary["date_range"] = (
-                        f"{dates.min().strftime('%Y-%m-%d')} to {dates.max().strftime('%Y-%m-%d')}"
+                        f"{lo.strftime('%Y-%m-%d')} to {hi.strftime('%Y-%m-%d')}"
                     )
                 except:
                     pass
 
-            if amount_cols:
+            if picked["amount"]:
                 try:
-                    summary["total_amount"] = df[amount_cols[0]].sum()
+                    summary["total_amount"] = sum_amounts(df[picked["amount"]])
                 except:
                     pass
 
             return {
                 "success": True,
                 "summary": summary,
-                "data": df.head(100).to_dict("records"),  # First 100 rows for preview
+                # Copy the few preview rows: a slice would keep the whole
+                # report alive while a background save holds this result
+                "data": df.head(self.PREVIEW_ROWS).copy(),
             }
 
         except Exception as e:
@@ -163,6 +230,7 @@ class ReportProcessor:
         """Process RPT908 Cancellation report"""
         try:
             # Extract key information
+            picked = self._pick_columns(list(df.columns))
             summary = {
                 "total_records": len(df),
                 "cancellation_reasons": {},
@@ -170,67 +238,256 @@ class ReportProcessor:
                 "date_range": None,
             }
 
-            # Try to find cancellation reason column
-            reason_cols = [
-                col
-                for col in df.columns
-                if "reason" in col.lower() or "cause" in col.lower()
-            ]
-            if reason_cols:
+            if picked["reason"]:
                 summary["cancellation_reasons"] = (
-                    df[reason_cols[0]].value_counts().to_dict()
+                    df[picked["reason"]].value_counts().to_dict()
                 )
 
-            # Try to find refund amount column
-            refund_cols = [
-                col
-                for col in df.columns
-                if "refund" in col.lower() or "amount" in col.lower()
-            ]
-            if refund_cols:
+            if picked["refund"]:
                 try:
-                    summary["total_refund_amount"] = df[refund_cols[0]].sum()
+                    summary["total_refund_amount"] = sum_amounts(df[picked["refund"]])
                 except:
                     pass
 
             return {
                 "success": True,
                 "summary": summary,
-                "data": df.head(100).to_dict("records"),  # First 100 rows for preview
+                # Copy the few preview rows: a slice would keep the whole
+                # report alive while a background save holds this result
+                "data": df.head(self.PREVIEW_ROWS).copy(),
             }
 
         except Exception as e:
             logger.error(f"Error processing RPT908: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def execute_sop_workflow(
-        self, report_type: str, df: pd.DataFrame
+    def history_frame(self) -> pd.DataFrame:
+        """Processing history as a DataFrame, rebuilt only after new runs"""
+        if self._history_df is None:
+            self._history_df = pd.DataFrame(list(self.processed_reports))
+        return self._history_df
+
+    def _pick_columns(self, columns: List[str]) -> Dict[str, Optional[str]]:
+        """Pick the columns the report summaries are computed from"""
+        picked: Dict[str, Optional[str]] = {
+            "payee": next((c for c in ("Payee", "Payee Number") if c in columns), None),
+            "dealer": next(
+                (c for c in ("Dealer", "Dealer Number") if c in columns), None
+            ),
+            **dict.fromkeys(_SUMMARY_KEYWORDS),
+        }
+        # One pass over the names; each role keeps its first matching column
+        for col in columns:
+            # Workbook headers can be numbers, so match on their text
+            lc = str(col).lower()
+            for key, keywords in _SUMMARY_KEYWORDS.items():
+                if picked[key] is None and any(k in lc for k in keywords):
+                    picked[key] = col
+        return picked
+
+    def categorize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Store the repetitive identifier columns as categoricals"""
+        picked = self._pick_columns(list(df.columns))
+        for key in ("payee", "dealer", "reason"):
+            if picked[key]:
+                df[picked[key]] = df[picked[key]].astype("category")
+        return df
+
+    def _summary_projection(
+        self, report_type: str, columns: List[str]
+    ) -> Tuple[Dict[str, Optional[str]], List[str]]:
+        """Pick the summary columns and the minimal column list to read"""
+        picked = self._pick_columns(columns)
+        keys: Tuple[str, ...]
+        if report_type == "RPT600":
+            keys = ("payee", "dealer", "date", "amount")
+        else:
+            keys = ("reason", "refund")
+        names = [picked[k] for k in keys]
+        usecols: List[str] = list(dict.fromkeys(col for col in names if col))
+        return picked, usecols or columns[:1]
+
+    def _aggregate_source(
+        self, report_type: str, source: ReportSource, file_name: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Execute the SOP workflow based on report type"""
+        """Summarize a report source: CSV in chunks, workbooks in one read"""
+        file_name = file_name or getattr(source, "name", source)
+        if file_name.endswith(".csv"):
+            return self._stream_aggregate(report_type, source, file_name)
+
+        # Workbook engines parse the whole sheet whatever nrows/usecols ask
+        # for, so one full read beats separate header, column and preview reads
         try:
+            df = read_report(source, file_name, fast_io=config.FAST_IO)
             if report_type == "RPT600":
-                result = self.process_rpt600(df)
-            elif report_type == "RPT908":
-                result = self.process_rpt908(df)
+                return self.process_rpt600(df)
+            return self.process_rpt908(df)
+
+        except Exception as e:
+            logger.error(f"Error summarizing {report_type}: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def _stream_aggregate(
+        self, report_type: str, source: ReportSource, file_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Summarize a large CSV report chunk by chunk with bounded memory"""
+        try:
+            header = read_report_header(source, file_name)
+            picked, usecols = self._summary_projection(
+                report_type, list(header.columns)
+            )
+            try:
+                totals = self._stream_totals(
+                    report_type, source, picked, usecols, config.FAST_IO
+                )
+            except ValueError as e:
+                if not config.FAST_IO:
+                    raise
+                # Arrow types a column from its first block; when a later
+                # block disagrees, start over on pandas' parser
+                logger.info(f"Re-reading {report_type} with pandas: {str(e)}")
+                totals = self._stream_totals(
+                    report_type, source, picked, usecols, fast_io=False
+                )
+
+            date_range = None
+            if pd.notna(totals["date_min"]):
+                date_range = (
+                    f"{totals['date_min'].strftime('%Y-%m-%d')} to "
+                    f"{totals['date_max'].strftime('%Y-%m-%d')}"
+                )
+            if report_type == "RPT600":
+                summary = {
+                    "total_records": totals["records"],
+                    "unique_payees": len(totals["payee"]),
+                    "unique_dealers": len(totals["dealer"]),
+                    "date_range": date_range,
+                    "total_amount": totals["amount"],
+                }
             else:
+                summary = {
+                    "total_records": totals["records"],
+                    "cancellation_reasons": dict(totals["reasons"].most_common()),
+                    "total_refund_amount": totals["amount"],
+                    "date_range": None,
+                }
+
+            preview = read_report(source, file_name, nrows=self.PREVIEW_ROWS)
+            return {
+                "success": True,
+                "summary": summary,
+                "data": preview,
+            }
+
+        except Exception as e:
+            logger.error(f"Error streaming {report_type}: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def _stream_totals(
+        self,
+        report_type: str,
+        source: ReportSource,
+        picked: Dict[str, Optional[str]],
+        usecols: List[str],
+        fast_io: bool,
+    ) -> Dict[str, Any]:
+        """Accumulate the summary totals over a CSV read in chunks"""
+        amount_col = picked["amount" if report_type == "RPT600" else "refund"]
+        # Read identifiers and dates as text so every chunk handles them the
+        # same way; reasons are only counted, which is fastest on categorical codes
+        text_cols = [picked[k] for k in ("payee", "dealer", "date")]
+        dtype: Dict[str, Any] = {col: str for col in usecols if col in text_cols}
+        reason_col = picked["reason"]
+        if reason_col and reason_col in usecols:
+            dtype[reason_col] = "category"
+
+        totals: Dict[str, Any] = {
+            "records": 0,
+            "amount": 0.0,
+            "payee": set(),
+            "dealer": set(),
+            "reasons": Counter(),
+            "date_min": pd.NaT,
+            "date_max": pd.NaT,
+        }
+        for chunk in iter_report_chunks(
+            source,
+            config.CHUNK_SIZE,
+            usecols=usecols,
+            dtype=dtype,
+            fast_io=fast_io,
+        ):
+            totals["records"] += len(chunk)
+            if amount_col:
+                totals["amount"] += sum_amounts(chunk[amount_col])
+            if report_type == "RPT600":
+                for key in ("payee", "dealer"):
+                    if picked[key]:
+                        totals[key].update(chunk[picked[key]].dropna().unique())
+                if picked["date"]:
+                    lo, hi = date_bounds(chunk[picked["date"]])
+                    if pd.notna(lo):
+                        date_min, date_max = totals["date_min"], totals["date_max"]
+                        totals["date_min"] = (
+                            lo if pd.isna(date_min) else min(date_min, lo)
+                        )
+                        totals["date_max"] = (
+                            hi if pd.isna(date_max) else max(date_max, hi)
+                        )
+            elif picked["reason"]:
+                totals["reasons"].update(
+                    chunk[picked["reason"]].value_counts().to_dict()
+                )
+        return totals
+
+    def execute_sop_workflow(
+        self,
+        report_type: str,
+        df: Optional[pd.DataFrame] = None,
+        source: Optional[ReportSource] = None,
+        file_name: Optional[str] = None,
+        export_excel: bool = False,
+        background: bool = False,
+    ) -> Dict[str, Any]:
+        """Execute the SOP workflow based on report type
+
+        Pass either a loaded ``df`` or a ``source``; CSV sources are summarized
+        in chunks from only the columns the summary needs. With ``background``
+        the outputs are written after returning; see ``wait_for_saves``.
+        """
+        try:
+            if report_type not in self.SUPPORTED_REPORTS:
                 return {
                     "success": False,
                     "error": f"Unsupported report type: {report_type}",
                 }
 
+            if df is None:
+                result = self._aggregate_source(report_type, source, file_name)
+            elif report_type == "RPT600":
+                result = self.process_rpt600(df)
+            else:
+                result = self.process_rpt908(df)
+
             if result["success"]:
                 # Log the processing
-                self.processed_reports.append(
-                    {
-                        "timestamp": datetime.now().isoformat(),
-                        "report_type": report_type,
-                        "records_processed": result["summary"]["total_records"],
-                        "status": "completed",
-                    }
-                )
+                log_entry = {
+                    "timestamp": datetime.now().isoformat(),
+                    "report_type": report_type,
+                    "records_processed": result["summary"]["total_records"],
+                    "status": "completed",
+                }
+                self.processed_reports.append(log_entry)
+                self._history_df = None
 
                 # Save processed data
-                self.save_processed_data(report_type, df, result)
+                save_args = (report_type, df, result, export_excel, log_entry)
+                if background:
+                    future = _SAVE_POOL.submit(self._save_outputs, *save_args)
+                    self._pending_saves.add(future)
+                    future.add_done_callback(self._save_finished)
+                else:
+                    self.save_processed_data(*save_args)
 
             return result
 
@@ -238,36 +495,235 @@ class ReportProcessor:
             logger.error(f"Error in SOP workflow: {str(e)}")
             return {"success": False, "error": str(e)}
 
+    def pending_saves(self) -> int:
+        """Number of background saves that have not finished yet"""
+        return len(self._pending_saves)
+
+    def wait_for_saves(self, timeout: Optional[float] = None) -> None:
+        """Block until background saves finish (or ``timeout`` seconds pass)"""
+        done, _ = wait(list(self._pending_saves), timeout=timeout)
+        # Waiters wake before done-callbacks run; settle the finished saves here
+        for future in done:
+            self._save_finished(future)
+
+    def take_failed_saves(self) -> List[str]:
+        """Errors of background saves that failed since the last call"""
+        failed: List[str] = []
+        while self._failed_saves:
+            failed.append(self._failed_saves.popleft())
+        return failed
+
+    def _save_finished(self, future: Future[None]) -> None:
+        """Forget a finished background save, keeping its error if it failed"""
+        with self._saves_lock:
+            if future not in self._pending_saves:
+                return
+            self._pending_saves.discard(future)
+            error = None if future.cancelled() else future.exception()
+            if error is not None:
+                logger.error(f"Error saving processed data: {str(error)}")
+                self._failed_saves.append(str(error))
+
     def save_processed_data(
-        self, report_type: str, df: pd.DataFrame, result: Dict[str, Any]
-    ):
-        """Save processed data to output directory"""
+        self,
+        report_type: str,
+        df: Optional[pd.DataFrame],
+        result: Dict[str, Any],
+        export_excel: bool = False,
+        log_entry: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Save processed data to output directory (raw data only when loaded)"""
         try:
-            output_dir = create_output_directory(config.OUTPUT_DIRECTORY)
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{report_type}_{timestamp}.xlsx"
-
-            # Save processed data
-            with pd.ExcelWriter(output_dir / filename, engine="openpyxl") as writer:
-                df.to_excel(writer, sheet_name="Raw_Data", index=False)
+            self._save_outputs(report_type, df, result, export_excel, log_entry)
+        except Exception as e:
+            logger.error(f"Error saving processed data: {str(e)}")
 
-                # Create summary sheet
-                summary_df = pd.DataFrame([result["summary"]])
+    def _save_outputs(
+        self,
+        report_type: str,
+        df: Optional[pd.DataFrame],
+        result: Dict[str, Any],
+        export_excel: bool = False,
+        log_entry: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Write one run's outputs; raises if they could not be written"""
+        output_dir = self._output_dir()
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Each run's log holds only its own entry, not the whole history
+        if log_entry is None and self.processed_reports:
+            log_entry = self.processed_reports[-1]
+        log_df = pd.DataFrame([log_entry] if log_entry else [])
+        outputs = (report_type, df, result["summary"], log_df)
+        try:
+            self._write_outputs(*outputs, output_dir, timestamp, export_excel)
+        except OSError:
+            # Retry once only if the cached directory has been removed
+            if output_dir.is_dir():
+                raise
+            output_dir = self._output_dir(refresh=True)
+            self._write_outputs(*outputs, output_dir, timestamp, export_excel)
+
+        logger.info(f"Processed data saved to {output_dir}")
+
+    def _output_dir(self, refresh: bool = False) -> Path:
+        """Create the output directory once and reuse it for later saves"""
+        base_path = config.OUTPUT_DIRECTORY
+        if refresh or base_path not in self._output_dirs:
+            self._output_dirs[base_path] = create_output_directory(base_path)
+        return self._output_dirs[base_path]
+
+    def _write_outputs(
+        self,
+        report_type: str,
+        df: Optional[pd.DataFrame],
+        summary: Dict[str, Any],
+        log_df: pd.DataFrame,
+        output_dir: Path,
+        timestamp: str,
+        export_excel: bool,
+    ) -> None:
+        """Write the summary as JSON, raw data and log as Parquet, XLSX on request
+
+        The workbook only carries the raw data when no Parquet copy is written.
+        """
+        stem = f"{report_type}_{timestamp}"
+
+        save_processing_summary(output_dir, report_type, summary, timestamp)
+        if HAS_PYARROW:
+            if df is not None:
+                write_parquet(df, output_dir / f"{stem}.parquet")
+            write_parquet(log_df, output_dir / f"{stem}_log.parquet")
+
+        # Parquet needs pyarrow, so fall back to the workbook without it
+        if export_excel or not HAS_PYARROW:
+            with pd.ExcelWriter(
+                output_dir / f"{stem}.xlsx",
+                engine=EXCEL_WRITER_ENGINE,
+                engine_kwargs=EXCEL_WRITER_KWARGS,
+            ) as writer:
+                if df is not None and not HAS_PYARROW:
+                    df.to_excel(writer, sheet_name="Raw_Data", index=False)
+
+                # Create summary sheet; nested breakdowns are stored as text
+                summary_df = pd.DataFrame(
+                    [
+                        {
+                            k: str(v) if isinstance(v, dict) else v
+                            for k, v in summary.items()
+                        }
+                    ]
+                )
                 summary_df.to_excel(writer, sheet_name="Summary", index=False)
 
                 # Create processing log sheet
-                log_df = pd.DataFrame(self.processed_reports)
                 log_df.to_excel(writer, sheet_name="Processing_Log", index=False)
 
-            logger.info(f"Processed data saved to {filename}")
 
-        except Exception as e:
-            logger.error(f"Error saving processed data: {str(e)}")
+@st.cache_data(show_spinner=False, hash_funcs={UploadedFile: lambda f: f.file_id})
+def upload_digest(uploaded_file: UploadedFile) -> str:
+    """Content hash of an upload, computed once per upload"""
+    return hashlib.blake2b(uploaded_file.getbuffer(), digest_size=16).hexdigest()
+
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def _validate_content(
+    _processor: ReportProcessor,
+    # Only read by st.cache_data: the content hash is the cache key
+    digest: str,  # noqa: ARG001
+    name: str,
+    _uploaded_file: UploadedFile,
+) -> Dict[str, Any]:
+    """Validate one distinct upload (content digest and name)"""
+    return _processor.validate_report(_uploaded_file, name)
+
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=8)
+def _load_content(
+    _processor: ReportProcessor, digest: str, name: str, _uploaded_file: UploadedFile
+) -> pd.DataFrame:
+    """Parse one distinct upload (content digest and name)"""
+    cache_dir = config.REPORT_CACHE_DIRECTORY
+    if cache_dir:
+        cached = load_cached_report(cache_dir, digest)
+        if cached is not None:
+            return cached
+    df = _processor.categorize(
+        read_report(_uploaded_file, name, fast_io=config.FAST_IO)
+    )
+    if cache_dir:
+        store_cached_report(cache_dir, digest, df)
+    return df
+
+
+def validate_upload(
+    processor: ReportProcessor, uploaded_file: UploadedFile
+) -> Dict[str, Any]:
+    """Validate an uploaded file once; reruns and re-uploads reuse the result"""
+    return _validate_content(
+        processor, upload_digest(uploaded_file), uploaded_file.name, uploaded_file
+    )
+
+
+def load_upload(
+    processor: ReportProcessor, uploaded_file: UploadedFile
+) -> pd.DataFrame:
+    """Parse the full uploaded file once; reruns and re-uploads reuse the DataFrame"""
+    return _load_content(
+        processor, upload_digest(uploaded_file), uploaded_file.name, uploaded_file
+    )
+
+
+def run_workflow(
+    processor: ReportProcessor,
+    report_type: str,
+    uploaded_file: UploadedFile,
+    export_excel: bool = False,
+) -> Dict[str, Any]:
+    """Run the SOP workflow, streaming CSV uploads that are too big to load
+
+    Workbooks cannot be read in chunks, so they always go through the
+    cached ``load_upload`` and keep their raw-data output.
+    """
+    threshold = config.STREAM_THRESHOLD_MB * 1024 * 1024
+    is_csv = uploaded_file.name.lower().endswith(".csv")
+    if is_csv and uploaded_file.size > threshold:
+        return processor.execute_sop_workflow(
+            report_type,
+            source=uploaded_file,
+            file_name=uploaded_file.name,
+            export_excel=export_excel,
+            background=True,
+        )
+
+    df = load_upload(processor, uploaded_file)
+    return processor.execute_sop_workflow(
+        report_type, df, export_excel=export_excel, background=True
+    )
+
+
+def show_save_status(processor: ReportProcessor) -> None:
+    """Report background saves that are still running or have failed"""
+    for error in processor.take_failed_saves():
+        st.error(f"❌ Saving processed data failed: {error}")
+    pending = processor.pending_saves()
+    if pending:
+        st.caption(f"💾 Saving {pending} report(s) in the background...")
+
+
+def configure_page() -> None:
+    """Page configuration; must be the first Streamlit call of every run"""
+    st.set_page_config(
+        page_title=config.APP_NAME,
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded",
+    )
 
 
 def main():
     """Main Streamlit application"""
+    configure_page()
     st.title(f"📊 {config.APP_NAME}")
     st.markdown(f"**Version:** {config.APP_VERSION}")
     st.markdown("Automated processing for RPT 600 and RPT 908 reports")
@@ -284,6 +740,12 @@ def main():
         help="Upload RPT600 or RPT908 report files",
     )
 
+    export_excel = st.sidebar.checkbox(
+        "Also export XLSX",
+        value=config.ENABLE_EXCEL_EXPORT,
+        help="Processed data is always saved as Parquet/JSON",
+    )
+
     # Configuration info
     with st.sidebar.expander("Configuration"):
         config_summary = config.get_config_summary()
@@ -294,14 +756,11 @@ def main():
     if uploaded_file is not None:
         st.header("Report Processing")
 
-        # Save uploaded file temporarily
-        temp_path = f"temp_{uploaded_file.name}"
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
         try:
             # Validate report
-            validation_result = st.session_state.processor.validate_report(temp_path)
+            validation_result = validate_upload(
+                st.session_state.processor, uploaded_file
+            )
 
             if validation_result["valid"]:
                 st.success("✅ File validated successfully!")
@@ -314,19 +773,17 @@ def main():
                 # Process button
                 if st.button("🚀 Process Report", type="primary"):
                     with st.spinner("Processing report..."):
-                        # Read the file
-                        if uploaded_file.name.endswith(".csv"):
-                            df = pd.read_csv(temp_path)
-                        else:
-                            df = pd.read_excel(temp_path)
-
                         # Execute SOP workflow
-                        result = st.session_state.processor.execute_sop_workflow(
-                            validation_result["report_type"], df
+                        result = run_workflow(
+                            st.session_state.processor,
+                            validation_result["report_type"],
+                            uploaded_file,
+                            export_excel,
                         )
 
                         if result["success"]:
                             st.success("✅ Report processed successfully!")
+                            show_save_status(st.session_state.processor)
 
                             # Display summary
                             st.subheader("Processing Summary")
@@ -366,8 +823,13 @@ def main():
 
                             # Display preview data
                             st.subheader("Data Preview")
-                            preview_df = pd.DataFrame(result["data"])
-                            st.dataframe(preview_df, use_container_width=True)
+                            preview_df = result["data"]
+                            st.dataframe(
+                                preview_df,
+                                height=400,
+                                use_container_width=True,
+                                hide_index=True,
+                            )
 
                         else:
                             st.error(f"❌ Processing failed: {result['error']}")
@@ -379,19 +841,15 @@ def main():
             st.error(f"❌ Error processing file: {str(e)}")
             logger.error(f"Error in main: {str(e)}")
 
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-
     else:
         st.info("👆 Please upload a report file using the sidebar")
 
         # Display processing history
         if st.session_state.processor.processed_reports:
             st.subheader("Processing History")
-            history_df = pd.DataFrame(st.session_state.processor.processed_reports)
+            history_df = st.session_state.processor.history_frame()
             st.dataframe(history_df, use_container_width=True)
+            show_save_status(st.session_state.processor)
 
     # Footer
     st.markdown("---")
@@ -4,16 +4,70 @@ Utility functions for the Cancellations SOP Processor
 
 import json
 import logging
+import os
+import re
+import shutil
+import uuid
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
 
 logger = logging.getLogger(__name__)
 
+# Set once setup_logging has attached its handlers
+_LOGGING_CONFIGURED = False
+
+# Characters that are not allowed in file names on common platforms
+_UNSAFE_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*]')
+
+# Optional native readers; pandas' default engines are used when missing
+try:
+    import python_calamine
+
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import xlsxwriter  # noqa: F401
+
+    EXCEL_WRITER_ENGINE = "xlsxwriter"
+    # Skip URL detection on every string cell. constant_memory is not usable:
+    # pandas writes cells column by column and it would drop earlier rows
+    EXCEL_WRITER_KWARGS: Dict[str, Any] = {"options": {"strings_to_urls": False}}
+except ImportError:
+    EXCEL_WRITER_ENGINE = "openpyxl"
+    EXCEL_WRITER_KWARGS = {}
+
 
 def setup_logging(log_level: str = "INFO") -> None:
-    """Setup logging configuration"""
+    """Setup logging configuration once per process"""
+    # Streamlit re-executes the app script on every rerun; without this guard
+    # each rerun would open another FileHandler on the log file
+    global _LOGGING_CONFIGURED
+    if _LOGGING_CONFIGURED:
+        return
+
     logging.basicConfig(
         level=getattr(logging, log_level.upper()),
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -22,6 +76,7 @@ def setup_logging(log_level: str = "INFO") -> None:
             logging.StreamHandler(),
         ],
     )
+    _LOGGING_CONFIGURED = True
 
 
 def validate_file_size(file_path: str, max_size_mb: int = 100) -> bool:
@@ -35,16 +90,316 @@ def validate_file_size(file_path: str, max_size_mb: int = 100) -> bool:
         return False
 
 
+# A report is read from a file path or from an open binary file object
+ReportSource = Union[str, "os.PathLike[str]", BinaryIO]
+
+
+def _report_name(source: ReportSource, file_name: Optional[str]) -> str:
+    """Name used to pick a reader: explicit name, then buffer name, then path"""
+    if file_name:
+        return file_name
+    name = (
+        source
+        if isinstance(source, (str, os.PathLike))
+        else getattr(source, "name", "")
+    )
+    return str(name)
+
+
+@contextmanager
+def _open_report(source: ReportSource) -> Iterator[BinaryIO]:
+    """Open a report path, or rewind an already open file object"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+
+# Leading bytes of the binary spreadsheet containers
+_ZIP_MAGIC = b"PK\x03\x04"  # xlsx/xlsm workbooks are zip archives
+_OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"  # legacy xls workbooks
+
+
+def sniff_report_format(source: ReportSource) -> str:
+    """Guess a report's real format ("csv", "xlsx" or "xls") from its first bytes"""
+    with _open_report(source) as f:
+        head = f.read(len(_OLE2_MAGIC))
+    if head.startswith(_ZIP_MAGIC):
+        return "xlsx"
+    if head.startswith(_OLE2_MAGIC):
+        return "xls"
+    return "csv"
+
+
+def read_report(
+    source: ReportSource,
+    file_name: Optional[str] = None,
+    fast_io: bool = True,
+    nrows: Optional[int] = None,
+    usecols: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Read a CSV or Excel report, preferring the native parsers when enabled
+
+    ``usecols`` limits parsing to the named columns.
+    """
+    with _open_report(source) as f:
+        if _report_name(source, file_name).endswith(".csv"):
+            # The pyarrow engine cannot stop after ``nrows``
+            if fast_io and HAS_PYARROW and nrows is None:
+                return pd.read_csv(
+                    f, engine="pyarrow", dtype_backend="pyarrow", usecols=usecols
+                )
+            return pd.read_csv(f, nrows=nrows, usecols=usecols)
+
+        if fast_io and HAS_CALAMINE:
+            # Arrow-backed columns, like the CSV path: compact strings, nullable ints
+            backend = {"dtype_backend": "pyarrow"} if HAS_PYARROW else {}
+            return pd.read_excel(
+                f, nrows=nrows, usecols=usecols, engine="calamine", **backend
+            )
+        return pd.read_excel(f, nrows=nrows, usecols=usecols)
+
+
+def iter_report_chunks(
+    source: ReportSource,
+    chunksize: int,
+    usecols: Optional[List[str]] = None,
+    dtype: Optional[Dict[str, Any]] = None,
+    fast_io: bool = True,
+) -> Iterator[pd.DataFrame]:
+    """Read a CSV report as DataFrames of at most ``chunksize`` rows
+
+    ``dtype`` maps columns to ``str`` or ``"category"``. With pyarrow the
+    file goes through Arrow's block reader, which fixes the type of any other
+    column from the first block and raises ``ValueError`` if a later block
+    disagrees.
+    """
+    if fast_io and HAS_PYARROW:
+        yield from _iter_arrow_chunks(source, chunksize, usecols, dtype or {})
+        return
+
+    # One ExitStack rather than a parenthesized with, which needs Python 3.10
+    with ExitStack() as stack:
+        f = stack.enter_context(_open_report(source))
+        reader = pd.read_csv(f, chunksize=chunksize, usecols=usecols, dtype=dtype)
+        yield from stack.enter_context(reader)
+
+
+def _arrow_dtype(arrow_type: Any) -> Optional[pd.ArrowDtype]:
+    """Keep Arrow columns Arrow-backed, except dictionaries become categoricals"""
+    return None if pa.types.is_dictionary(arrow_type) else pd.ArrowDtype(arrow_type)
+
+
+def _iter_arrow_chunks(
+    source: ReportSource,
+    chunksize: int,
+    usecols: Optional[List[str]],
+    dtype: Dict[str, Any],
+) -> Iterator[pd.DataFrame]:
+    """Stream a CSV through pyarrow's reader, sliced to ``chunksize`` rows"""
+    column_types = {
+        col: (
+            pa.dictionary(pa.int32(), pa.string())
+            if kind == "category"
+            else pa.string()
+        )
+        for col, kind in dtype.items()
+    }
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=usecols,
+        column_types=column_types,
+        strings_can_be_null=True,
+    )
+    with _open_report(source) as f:
+        for batch in pa_csv.open_csv(f, convert_options=convert_options):
+            # Slicing a record batch is zero-copy
+            for start in range(0, batch.num_rows, chunksize):
+                chunk = batch.slice(start, chunksize)
+                yield chunk.to_pandas(types_mapper=_arrow_dtype)
+
+
+def read_report_header(
+    source: ReportSource, file_name: Optional[str] = None, fast_io: bool = True
+) -> pd.DataFrame:
+    """Read only the header row of a report as an empty DataFrame"""
+    with _open_report(source) as f:
+        if _report_name(source, file_name).endswith(".csv"):
+            return pd.read_csv(f, nrows=0)
+
+        if fast_io and HAS_CALAMINE:
+            return pd.read_excel(f, nrows=0, engine="calamine")
+        return pd.read_excel(f, nrows=0)
+
+
+def count_report_rows(
+    source: ReportSource, file_name: Optional[str] = None, fast_io: bool = True
+) -> int:
+    """Count data rows in a report without parsing cell values"""
+    with _open_report(source) as f:
+        if _report_name(source, file_name).endswith(".csv"):
+            lines = 0
+            last = b""
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                lines += chunk.count(b"\n")
+                last = chunk
+            # Count a final line that has no trailing newline
+            if last and not last.endswith(b"\n"):
+                lines += 1
+            return max(lines - 1, 0)
+
+        if fast_io and HAS_CALAMINE:
+            workbook = python_calamine.CalamineWorkbook.from_filelike(f)
+            return max(workbook.get_sheet_by_index(0).height - 1, 0)
+
+        workbook = load_workbook(f, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            max_row: Optional[int] = sheet.max_row
+            if max_row is None:
+                max_row = sum(1 for _ in sheet.iter_rows(values_only=True))
+            return max(max_row - 1, 0)
+        finally:
+            workbook.close()
+
+
+def inspect_report(
+    source: ReportSource, file_name: Optional[str] = None, fast_io: bool = True
+) -> Tuple[pd.DataFrame, int]:
+    """Read a report's header and data row count, loading a workbook only once"""
+    if _report_name(source, file_name).endswith(".csv") or not (
+        fast_io and HAS_CALAMINE
+    ):
+        return (
+            read_report_header(source, file_name, fast_io=fast_io),
+            count_report_rows(source, file_name, fast_io=fast_io),
+        )
+
+    # calamine loads the whole sheet either way, so take both from one load
+    with _open_report(source) as f:
+        sheet = python_calamine.CalamineWorkbook.from_filelike(f).get_sheet_by_index(0)
+        rows = sheet.to_python(nrows=1)
+    if not rows:
+        return pd.DataFrame(), 0
+
+    # Name columns the way read_excel does (integral floats become ints)
+    names = [int(v) if isinstance(v, float) and v.is_integer() else v for v in rows[0]]
+    header = TextParser([names], header=0).read()
+    return header, max(sheet.height - 1, 0)
+
+
+# Tried in order against the first value of a date column
+_DATE_FORMATS = ("ISO8601", "%m/%d/%Y", "%m/%d/%y", "%d-%b-%Y")
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Parse a date column with one format sniffed from its first value"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    valid = values.notna().to_numpy()
+    if not valid.any():
+        return pd.to_datetime(values, errors="coerce")
+
+    first = values.iloc[valid.argmax()]
+    for fmt in _DATE_FORMATS:
+        try:
+            pd.to_datetime(first, format=fmt)
+        except (TypeError, ValueError):
+            continue
+
+        parsed = pd.to_datetime(values, format=fmt, errors="coerce", cache=True)
+        # Values in another format fall back to per-value inference
+        missed = parsed.isna().to_numpy() & valid
+        if missed.any():
+            parsed[missed] = pd.to_datetime(values[missed], errors="coerce", cache=True)
+        return parsed
+
+    return pd.to_datetime(values, errors="coerce", cache=True)
+
+
+# int64 value numpy uses for NaT in datetime64 arrays
+_NAT_TICKS = np.iinfo(np.int64).min
+
+
+def date_bounds(values: pd.Series) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Earliest and latest date in a column, NaT when none parse"""
+    dates = parse_dates(values)
+    if not (isinstance(dates.dtype, np.dtype) and dates.dtype.kind == "M"):
+        # Timezone-aware or Arrow-backed dates take pandas' reductions
+        return dates.min(), dates.max()
+
+    # Reduce the raw ticks with NaT masked out once, instead of two
+    # NaT-skipping reductions
+    ticks = dates.to_numpy().view("i8")
+    ticks = ticks[ticks != _NAT_TICKS]
+    if not ticks.size:
+        return pd.NaT, pd.NaT
+    unit = np.datetime_data(dates.dtype)[0]
+    return pd.Timestamp(ticks.min(), unit=unit), pd.Timestamp(ticks.max(), unit=unit)
+
+
+# Currency symbols, thousands separators and padding in text amounts
+_AMOUNT_NOISE = re.compile(r"[$,\s]")
+
+
+def sum_amounts(values: pd.Series) -> float:
+    """Sum a money column, reading text such as "$1,234.50" as numbers
+
+    Cells that still are not numbers count as zero.
+    """
+    if not pd.api.types.is_numeric_dtype(values):
+        text = values.astype("string").str.replace(_AMOUNT_NOISE, "", regex=True)
+        values = pd.to_numeric(text, errors="coerce")
+    return float(values.sum())
+
+
+def write_parquet(df: pd.DataFrame, path: Path) -> None:
+    """Write a DataFrame to a zstd-compressed Parquet file"""
+    try:
+        df.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
+    except (TypeError, ValueError):
+        # Arrow needs one type per column; store mixed object columns as text
+        mixed = df.select_dtypes(include="object").columns
+        df.astype({col: "string" for col in mixed}).to_parquet(
+            path, engine="pyarrow", compression="zstd", index=False
+        )
+
+
+def load_cached_report(cache_dir: Union[str, Path], key: str) -> Optional[pd.DataFrame]:
+    """Read a parsed report cached under its content key, if there is one"""
+    path = Path(cache_dir) / f"{key}.parquet"
+    if not path.is_file():
+        return None
+    try:
+        return pd.read_parquet(path, engine="pyarrow")
+    except (OSError, ValueError) as e:
+        # An unreadable entry is a cache miss; the caller rewrites it
+        logger.warning(f"Ignoring cached report {path.name}: {e}")
+        return None
+
+
+def store_cached_report(
+    cache_dir: Union[str, Path], key: str, df: pd.DataFrame
+) -> None:
+    """Cache a parsed report as Parquet under its content key"""
+    cache_dir = Path(cache_dir)
+    partial = cache_dir / f"{key}.{uuid.uuid4().hex}.tmp"
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write then rename so other sessions never read a half-written file
+        write_parquet(df, partial)
+        partial.replace(cache_dir / f"{key}.parquet")
+    except OSError as e:
+        logger.warning(f"Could not cache report {key}: {e}")
+        partial.unlink(missing_ok=True)
+
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for safe file operations"""
-    import re
-
-    # Remove or replace unsafe characters
-    safe_filename = re.sub(r'[<>:"/\\|?*]', "_", filename)
-    # Limit length
-    if len(safe_filename) > 255:
-        safe_filename = safe_filename[:255]
-    return safe_filename
+    # Replace unsafe characters and limit length
+    return _UNSAFE_FILENAME_CHARS.sub("_", filename)[:255]
 
 
 def create_output_directory(base_path: str = "processed_reports") -> Path:
@@ -54,6 +409,13 @@ def create_output_directory(base_path: str = "processed_reports") -> Path:
     return output_dir
 
 
+def _json_default(value: Any) -> Any:
+    """Serialize numpy scalars as numbers and anything else unknown as text"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
 def save_processing_summary(
     output_dir: Path, report_type: str, summary: Dict[str, Any], timestamp: str
 ) -> Path:
@@ -61,8 +423,18 @@ def save_processing_summary(
     summary_file = output_dir / f"{report_type}_summary_{timestamp}.json"
 
     try:
-        with open(summary_file, "w") as f:
-            json.dump(summary, f, indent=2, default=str)
+        if HAS_ORJSON:
+            # Numpy scalars and non-string keys serialize natively, not via str
+            options = (
+                orjson.OPT_INDENT_2
+                | orjson.OPT_SERIALIZE_NUMPY
+                | orjson.OPT_NON_STR_KEYS
+            )
+            with open(summary_file, "wb") as f:
+                f.write(orjson.dumps(summary, option=options, default=str))
+        else:
+            with open(summary_file, "w") as f:
+                json.dump(summary, f, indent=2, default=_json_default)
         logger.info(f"Processing summary saved to {summary_file}")
         return summary_file
     except Exception as e:
@@ -73,8 +445,14 @@ def save_processing_summary(
 def load_processing_summary(summary_file: Path) -> Optional[Dict[str, Any]]:
     """Load processing summary from JSON file"""
     try:
-        with open(summary_file) as f:
-            return json.load(f)
+        summary: Dict[str, Any]
+        if HAS_ORJSON:
+            with open(summary_file, "rb") as f:
+                summary = orjson.loads(f.read())
+        else:
+            with open(summary_file) as f:
+                summary = json.load(f)
+        return summary
     except Exception as e:
         logger.error(f"Error loading processing summary: {e}")
         return None
@@ -132,8 +510,6 @@ def create_backup_file(original_path: str) -> str:
         original_file = Path(original_path)
         backup_path = original_file.with_suffix(f"{original_file.suffix}.backup")
 
-        import shutil
-
         shutil.copy2(original_file, backup_path)
         logger.info(f"Backup created at {backup_path}")
         return str(backup_path)
@@ -6,118 +6,93 @@ This file is specifically designed for Streamlit Cloud deployment
 import logging
 import os
 import sys
-from datetime import datetime
-from typing import Any, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 # Add the src/app directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src', 'app'))
 
-# Now import the modules
+# Now import the modules; the report processing itself lives in main
+import main as app
 from config import config
-from utils import create_output_directory, format_currency, setup_logging
-
-# Configure logging
-setup_logging(config.LOG_LEVEL)
-logger = logging.getLogger(__name__)
-
-# Configure Streamlit page
-st.set_page_config(
-    page_title=config.APP_NAME,
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded",
+from main import (
+    configure_page,
+    run_workflow,
+    show_save_status,
+    upload_digest,
+    validate_upload,
 )
+from utils import format_currency
 
-class ReportProcessor:
-    """Handles processing of RPT 600 and RPT 908 reports"""
-
-    def __init__(self):
-        self.supported_reports = ["RPT600", "RPT908"]
-        self.processed_reports = []
-
-    def validate_report(self, file_path: str) -> Dict[str, Any]:
-        """Validate uploaded report file"""
-        try:
-            # Check file extension
-            if file_path.endswith(".csv"):
-                df = pd.read_csv(file_path)
-            elif file_path.endswith(".xlsx"):
-                df = pd.read_excel(file_path)
-            else:
-                return {
-                    "valid": False,
-                    "error": "Unsupported file format. Please upload CSV or Excel files.",
-                }
-
-            # Basic validation
-            if df.empty:
-                return {"valid": False, "error": "File appears to be empty"}
-
-            # Check for required columns based on report type
-            report_type = self.detect_report_type(df)
-            if not report_type:
-                return {"valid": False, "error": "Could not determine report type"}
-
-            return {
-                "valid": True,
-                "report_type": report_type,
-                "row_count": len(df),
-                "columns": list(df.columns),
-            }
+logger = logging.getLogger(__name__)
 
-        except Exception as e:
-            logger.error(f"Error validating report: {str(e)}")
-            return {"valid": False, "error": f"Error reading file: {str(e)}"}
+# More comprehensive indicators for RPT600 (Payee Statement)
+_RPT600_INDICATORS = frozenset({
+    "payee", "commission", "dealer", "fee", "amount", "payment",
+    "earnings", "compensation", "bonus", "incentive", "revenue",
+    "payee number", "dealer number", "agent", "representative",
+})
+# More comprehensive indicators for RPT908 (Cancellation Report)
+_RPT908_INDICATORS = frozenset({
+    "cancellation", "cancel", "termination", "refund", "contract",
+    "policy", "agreement", "discontinuation", "cessation", "end date",
+    "cancellation reason", "termination reason", "refund amount",
+    "cancellation date", "termination date",
+})
+# Very specific indicators that earn bonus points
+_RPT600_BONUS = ("payee", "commission")
+_RPT908_BONUS = ("cancellation", "refund")
+
+
+@lru_cache(maxsize=1024)
+def _column_scores(column: str) -> Tuple[int, int]:
+    """Count RPT600 and RPT908 indicators matching a lowercase column name"""
+    return (
+        sum(ind in column or column in ind for ind in _RPT600_INDICATORS),
+        sum(ind in column or column in ind for ind in _RPT908_INDICATORS),
+    )
+
+
+@lru_cache(maxsize=128)
+def _indicator_scores(columns: Tuple[Any, ...]) -> Tuple[int, int]:
+    """Score a schema for RPT600 and RPT908, memoized per column tuple"""
+    # Workbook headers can be numbers, so name every column as text
+    names = [str(col).lower() for col in columns]
+
+    # Each indicator found in a column name (or containing it) scores a point
+    scores = [_column_scores(name) for name in names]
+    rpt600_score = sum(score[0] for score in scores)
+    rpt908_score = sum(score[1] for score in scores)
+
+    # Add bonus points for very specific indicators; newlines keep a
+    # match from spanning two column names
+    joined = "\n".join(names)
+    rpt600_score += 2 * sum(indicator in joined for indicator in _RPT600_BONUS)
+    rpt908_score += 2 * sum(indicator in joined for indicator in _RPT908_BONUS)
+    return rpt600_score, rpt908_score
+
+
+class ReportProcessor(app.ReportProcessor):
+    """Report processor with the Cloud app's broader report detection"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Validation results of the current uploads, by content digest and name
+        self.upload_validations: Dict[Tuple[str, str], Dict[str, Any]] = {}
 
     def detect_report_type(self, df: pd.DataFrame) -> Optional[str]:
         """Detect if this is RPT600 or RPT908 based on column structure"""
-        columns = [col.lower() for col in df.columns]
-        
-        # More comprehensive indicators for RPT600 (Payee Statement)
-        rpt600_indicators = [
-            "payee", "commission", "dealer", "fee", "amount", "payment",
-            "earnings", "compensation", "bonus", "incentive", "revenue",
-            "payee number", "dealer number", "agent", "representative"
-        ]
-        
-        # More comprehensive indicators for RPT908 (Cancellation Report)
-        rpt908_indicators = [
-            "cancellation", "cancel", "termination", "refund", "contract",
-            "policy", "agreement", "discontinuation", "cessation", "end date",
-            "cancellation reason", "termination reason", "refund amount",
-            "cancellation date", "termination date"
-        ]
-        
-        # Calculate scores with more flexible matching
-        rpt600_score = 0
-        rpt908_score = 0
-        
-        for col in columns:
-            # Check for exact matches and partial matches
-            for indicator in rpt600_indicators:
-                if indicator in col or col in indicator:
-                    rpt600_score += 1
-                    
-            for indicator in rpt908_indicators:
-                if indicator in col or col in indicator:
-                    rpt908_score += 1
-        
-        # Add bonus points for very specific indicators
-        if any("payee" in col for col in columns):
-            rpt600_score += 2
-        if any("commission" in col for col in columns):
-            rpt600_score += 2
-        if any("cancellation" in col for col in columns):
-            rpt908_score += 2
-        if any("refund" in col for col in columns):
-            rpt908_score += 2
-            
-        # Debug information (you can remove this in production)
-        st.sidebar.write(f"Debug - RPT600 Score: {rpt600_score}, RPT908 Score: {rpt908_score}")
-        
+        rpt600_score, rpt908_score = _indicator_scores(tuple(df.columns))
+
+        logger.debug("RPT600 score: %d, RPT908 score: %d", rpt600_score, rpt908_score)
+
         # Determine report type with a threshold
         if rpt600_score > rpt908_score and rpt600_score >= 1:
             return "RPT600"
@@ -126,172 +101,96 @@ class ReportProcessor:
         else:
             return None
 
-    def process_rpt600(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Process RPT600 Payee Statement report"""
-        try:
-            summary = {
-                "total_records": len(df),
-                "unique_payees": (
-                    df.get("Payee", df.get("Payee Number", pd.Series())).nunique()
-                    if "Payee" in df.columns or "Payee Number" in df.columns
-                    else 0
-                ),
-                "unique_dealers": (
-                    df.get("Dealer", df.get("Dealer Number", pd.Series())).nunique()
-                    if "Dealer" in df.columns or "Dealer Number" in df.columns
-                    else 0
-                ),
-                "date_range": None,
-                "total_amount": 0,
-            }
-
-            # Try to find date columns and amount columns
-            date_cols = [
-                col
-                for col in df.columns
-                if "date" in col.lower() or "time" in col.lower()
-            ]
-            amount_cols = [
-                col
-                for col in df.columns
-                if "amount" in col.lower()
-                or "commission" in col.lower()
-                or "fee" in col.lower()
-            ]
-
-            if date_cols:
-                try:
-                    dates = pd.to_datetime(df[date_cols[0]], errors="coerce")
-                    summary["date_range"] = (
-                        f"{dates.min().strftime('%Y-%m-%d')} to {dates.max().strftime('%Y-%m-%d')}"
-                    )
-                except:
-                    pass
-
-            if amount_cols:
-                try:
-                    summary["total_amount"] = df[amount_cols[0]].sum()
-                except:
-                    pass
 
+def _batch_row(
+    processor: ReportProcessor,
+    file_name: str,
+    uploaded_file: UploadedFile,
+    export_excel: bool,
+) -> Dict[str, Any]:
+    """Validate and process one batch file into a results table row"""
+    try:
+        validation_result = validate_upload(processor, uploaded_file)
+        if not validation_result["valid"]:
             return {
-                "success": True,
-                "summary": summary,
-                "data": df.head(100).to_dict("records"),  # First 100 rows for preview
+                "File": file_name,
+                "Type": "Unknown",
+                "Records": 0,
+                "Status": "❌ Validation Failed",
+                "Message": validation_result["error"],
             }
 
-        except Exception as e:
-            logger.error(f"Error processing RPT600: {str(e)}")
-            return {"success": False, "error": str(e)}
-
-    def process_rpt908(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Process RPT908 Cancellation report"""
-        try:
-            summary = {
-                "total_records": len(df),
-                "cancellation_reasons": {},
-                "total_refund_amount": 0,
-                "date_range": None,
-            }
-
-            # Try to find cancellation reason column
-            reason_cols = [
-                col
-                for col in df.columns
-                if "reason" in col.lower() or "cause" in col.lower()
-            ]
-            if reason_cols:
-                summary["cancellation_reasons"] = (
-                    df[reason_cols[0]].value_counts().to_dict()
-                )
-
-            # Try to find refund amount column
-            refund_cols = [
-                col
-                for col in df.columns
-                if "refund" in col.lower() or "amount" in col.lower()
-            ]
-            if refund_cols:
-                try:
-                    summary["total_refund_amount"] = df[refund_cols[0]].sum()
-                except:
-                    pass
-
-            return {
-                "success": True,
-                "summary": summary,
-                "data": df.head(100).to_dict("records"),  # First 100 rows for preview
-            }
-
-        except Exception as e:
-            logger.error(f"Error processing RPT908: {str(e)}")
-            return {"success": False, "error": str(e)}
-
-    def execute_sop_workflow(
-        self, report_type: str, df: pd.DataFrame
-    ) -> Dict[str, Any]:
-        """Execute the SOP workflow based on report type"""
-        try:
-            if report_type == "RPT600":
-                result = self.process_rpt600(df)
-            elif report_type == "RPT908":
-                result = self.process_rpt908(df)
-            else:
-                return {
-                    "success": False,
-                    "error": f"Unsupported report type: {report_type}",
-                }
-
-            if result["success"]:
-                # Log the processing
-                self.processed_reports.append(
-                    {
-                        "timestamp": datetime.now().isoformat(),
-                        "report_type": report_type,
-                        "records_processed": result["summary"]["total_records"],
-                        "status": "completed",
-                    }
-                )
-
-                # Save processed data
-                self.save_processed_data(report_type, df, result)
-
-            return result
-
-        except Exception as e:
-            logger.error(f"Error in SOP workflow: {str(e)}")
-            return {"success": False, "error": str(e)}
-
-    def save_processed_data(
-        self, report_type: str, df: pd.DataFrame, result: Dict[str, Any]
-    ):
-        """Save processed data to output directory"""
-        try:
-            output_dir = create_output_directory(config.OUTPUT_DIRECTORY)
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{report_type}_{timestamp}.xlsx"
-
-            # Save processed data
-            with pd.ExcelWriter(output_dir / filename, engine="openpyxl") as writer:
-                df.to_excel(writer, sheet_name="Raw_Data", index=False)
-
-                # Create summary sheet
-                summary_df = pd.DataFrame([result["summary"]])
-                summary_df.to_excel(writer, sheet_name="Summary", index=False)
-
-                # Create processing log sheet
-                log_df = pd.DataFrame(self.processed_reports)
-                log_df.to_excel(writer, sheet_name="Processing_Log", index=False)
-
-            logger.info(f"Processed data saved to {filename}")
-
-        except Exception as e:
-            logger.error(f"Error saving processed data: {str(e)}")
+        result = run_workflow(
+            processor, validation_result["report_type"], uploaded_file, export_excel
+        )
+        return {
+            "File": file_name,
+            "Type": validation_result["report_type"],
+            "Records": validation_result["row_count"],
+            "Status": "✅ Success" if result["success"] else "❌ Failed",
+            "Message": result.get("error", "Processed successfully"),
+        }
+    except Exception as e:
+        return {
+            "File": file_name,
+            "Type": "Error",
+            "Records": 0,
+            "Status": "❌ Error",
+            "Message": str(e),
+        }
+
+
+def _map_in_session(func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+    """Map ``func`` over ``items`` on one worker thread per CPU, in order"""
+    workers = min(len(items), os.cpu_count() or 1)
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    # Workers share the session's context so cached loaders behave as usual
+    ctx = get_script_run_ctx()
+
+    def call(item: Any) -> Any:
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(item)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(call, items))
+
+
+def run_batch(
+    processor: ReportProcessor,
+    files: List[Tuple[str, UploadedFile]],
+    export_excel: bool = False,
+) -> List[Dict[str, Any]]:
+    """Process batch files concurrently, one worker thread per CPU"""
+    return _map_in_session(
+        lambda job: _batch_row(processor, *job, export_excel), files
+    )
+
+
+def validate_uploads(
+    processor: ReportProcessor, uploaded_files: List[UploadedFile]
+) -> List[Dict[str, Any]]:
+    """Validate several uploads concurrently; results are in upload order
+
+    Uploads already validated in this session are answered from the
+    processor, so a rerun with nothing new starts no worker threads.
+    """
+    keys = [(upload_digest(f), f.name) for f in uploaded_files]
+    known = processor.upload_validations
+    new = [(key, f) for key, f in zip(keys, uploaded_files) if key not in known]
+    results = _map_in_session(lambda job: validate_upload(processor, job[1]), new)
+
+    # Keep only the current uploads so the record cannot grow without bound
+    validations = {key: known[key] for key in keys if key in known}
+    validations.update((key, result) for (key, _), result in zip(new, results))
+    processor.upload_validations = validations
+    return [validations[key] for key in keys]
 
 
 def main():
     """Main Streamlit application"""
+    configure_page()
     st.title(f"📊 {config.APP_NAME}")
     st.markdown(f"**Version:** {config.APP_VERSION}")
     st.markdown("Automated processing for RPT 600 and RPT 908 reports")
@@ -299,6 +198,8 @@ def main():
     # Initialize processor
     if "processor" not in st.session_state:
         st.session_state.processor = ReportProcessor()
+    st.session_state.setdefault("batch_processing", False)
+    batch_mode = st.session_state.batch_processing
 
     # Sidebar
     st.sidebar.header("Report Upload")
@@ -315,86 +216,40 @@ def main():
         )
     
     with upload_tab2:
-        st.markdown("**Upload files with specific names:**")
-        
-        # Named upload sections
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("**RPT600 Files:**")
-            rpt600_file1 = st.file_uploader(
-                "RPT600 - Payee Statement 1",
+        # A form holds uploads back until submit, so adding files to both
+        # uploaders costs one rerun instead of one per change
+        with st.form("named_upload_form"):
+            st.markdown("**Upload files by report type:**")
+            rpt600_files = st.file_uploader(
+                "RPT600 - Payee Statements",
                 type=["csv", "xlsx"],
-                key="rpt600_1",
-                help="Upload first RPT600 file"
+                accept_multiple_files=True,
+                key="rpt600",
+                help="Upload one or more RPT600 files"
             )
-            rpt600_file2 = st.file_uploader(
-                "RPT600 - Payee Statement 2", 
+            rpt908_files = st.file_uploader(
+                "RPT908 - Cancellations",
                 type=["csv", "xlsx"],
-                key="rpt600_2",
-                help="Upload second RPT600 file"
-            )
-            rpt600_file3 = st.file_uploader(
-                "RPT600 - Payee Statement 3",
-                type=["csv", "xlsx"], 
-                key="rpt600_3",
-                help="Upload third RPT600 file"
+                accept_multiple_files=True,
+                key="rpt908",
+                help="Upload one or more RPT908 files"
             )
+            st.form_submit_button("Upload", use_container_width=True)
         
-        with col2:
-            st.markdown("**RPT908 Files:**")
-            rpt908_file1 = st.file_uploader(
-                "RPT908 - Cancellation 1",
-                type=["csv", "xlsx"],
-                key="rpt908_1",
-                help="Upload first RPT908 file"
-            )
-            rpt908_file2 = st.file_uploader(
-                "RPT908 - Cancellation 2",
-                type=["csv", "xlsx"],
-                key="rpt908_2", 
-                help="Upload second RPT908 file"
-            )
-            rpt908_file3 = st.file_uploader(
-                "RPT908 - Cancellation 3",
-                type=["csv", "xlsx"],
-                key="rpt908_3",
-                help="Upload third RPT908 file"
-            )
-        
-        # Additional named uploads
-        st.markdown("**Other Files:**")
-        other_file1 = st.file_uploader(
-            "Additional Report 1",
-            type=["csv", "xlsx"],
-            key="other_1",
-            help="Upload any other report file"
-        )
-        other_file2 = st.file_uploader(
-            "Additional Report 2", 
-            type=["csv", "xlsx"],
-            key="other_2",
-            help="Upload any other report file"
-        )
-        
-        # Collect all named files
-        named_files = []
-        if rpt600_file1:
-            named_files.append(("RPT600 - Payee Statement 1", rpt600_file1, "RPT600"))
-        if rpt600_file2:
-            named_files.append(("RPT600 - Payee Statement 2", rpt600_file2, "RPT600"))
-        if rpt600_file3:
-            named_files.append(("RPT600 - Payee Statement 3", rpt600_file3, "RPT600"))
-        if rpt908_file1:
-            named_files.append(("RPT908 - Cancellation 1", rpt908_file1, "RPT908"))
-        if rpt908_file2:
-            named_files.append(("RPT908 - Cancellation 2", rpt908_file2, "RPT908"))
-        if rpt908_file3:
-            named_files.append(("RPT908 - Cancellation 3", rpt908_file3, "RPT908"))
-        if other_file1:
-            named_files.append(("Additional Report 1", other_file1, "Unknown"))
-        if other_file2:
-            named_files.append(("Additional Report 2", other_file2, "Unknown"))
+        # Collect all named files with the type they were uploaded as
+        named_files = [
+            (f"RPT600 - Payee Statement {i+1}", file, "RPT600")
+            for i, file in enumerate(rpt600_files or [])
+        ] + [
+            (f"RPT908 - Cancellation {i+1}", file, "RPT908")
+            for i, file in enumerate(rpt908_files or [])
+        ]
+
+    export_excel = st.sidebar.checkbox(
+        "Also export XLSX",
+        value=config.ENABLE_EXCEL_EXPORT,
+        help="Processed data is always saved as Parquet/JSON",
+    )
 
     # Configuration info
     with st.sidebar.expander("Configuration"):
@@ -429,59 +284,23 @@ def main():
                 st.rerun()
         
         # Show batch processing results if enabled
-        if hasattr(st.session_state, 'batch_processing') and st.session_state.batch_processing:
+        if batch_mode:
             st.success("🔄 **Batch Processing Mode Active** - Processing all files...")
             
-            batch_results = []
-            for i, (file_name, uploaded_file, expected_type) in enumerate(all_files):
-                temp_path = f"temp_batch_{uploaded_file.name}_{i}"
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                
-                try:
-                    # Validate and process
-                    validation_result = st.session_state.processor.validate_report(temp_path)
-                    if validation_result["valid"]:
-                        if uploaded_file.name.endswith(".csv"):
-                            df = pd.read_csv(temp_path)
-                        else:
-                            df = pd.read_excel(temp_path)
-                        
-                        result = st.session_state.processor.execute_sop_workflow(
-                            validation_result["report_type"], df
-                        )
-                        
-                        batch_results.append({
-                            "File": file_name,
-                            "Type": validation_result["report_type"],
-                            "Records": validation_result["row_count"],
-                            "Status": "✅ Success" if result["success"] else "❌ Failed",
-                            "Message": result.get("error", "Processed successfully")
-                        })
-                    else:
-                        batch_results.append({
-                            "File": file_name,
-                            "Type": "Unknown",
-                            "Records": 0,
-                            "Status": "❌ Validation Failed",
-                            "Message": validation_result["error"]
-                        })
-                except Exception as e:
-                    batch_results.append({
-                        "File": file_name,
-                        "Type": "Error",
-                        "Records": 0,
-                        "Status": "❌ Error",
-                        "Message": str(e)
-                    })
-                finally:
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
+            batch_results = run_batch(
+                st.session_state.processor,
+                [(file_name, uploaded_file) for file_name, uploaded_file, _ in all_files],
+                export_excel,
+            )
             
             # Display batch results
             st.subheader("📊 Batch Processing Results")
-            batch_df = pd.DataFrame(batch_results)
+            # Compact dtypes keep the table payload sent to the browser small
+            batch_df = pd.DataFrame(batch_results).astype(
+                {"Records": "int32", "Status": "category"}
+            )
             st.dataframe(batch_df, use_container_width=True)
+            show_save_status(st.session_state.processor)
             
             # Summary statistics
             successful = len([r for r in batch_results if "✅" in r["Status"]])
@@ -502,10 +321,16 @@ def main():
                 st.rerun()
         
         # Individual file processing
-        if not (hasattr(st.session_state, 'batch_processing') and st.session_state.batch_processing):
+        if not batch_mode:
             st.markdown("---")
             st.subheader("📋 Individual File Processing")
             
+            # Read headers for every file up front rather than one per render step
+            validations = validate_uploads(
+                st.session_state.processor,
+                [uploaded_file for _, uploaded_file, _ in all_files],
+            )
+            
             # Process each file
             for i, (file_name, uploaded_file, expected_type) in enumerate(all_files):
                 st.subheader(f"📄 {file_name}")
@@ -514,14 +339,8 @@ def main():
                 if expected_type != "Unknown":
                     st.info(f"**Expected Type:** {expected_type}")
                 
-                # Save uploaded file temporarily
-                temp_path = f"temp_{uploaded_file.name}_{i}"
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-
                 try:
-                    # Validate report
-                    validation_result = st.session_state.processor.validate_report(temp_path)
+                    validation_result = validations[i]
 
                     if validation_result["valid"]:
                         st.success("✅ File validated successfully!")
@@ -538,19 +357,17 @@ def main():
                         # Process button for this specific file
                         if st.button(f"🚀 Process {file_name}", key=f"process_{i}", type="primary"):
                             with st.spinner(f"Processing {file_name}..."):
-                                # Read the file
-                                if uploaded_file.name.endswith(".csv"):
-                                    df = pd.read_csv(temp_path)
-                                else:
-                                    df = pd.read_excel(temp_path)
-
                                 # Execute SOP workflow
-                                result = st.session_state.processor.execute_sop_workflow(
-                                    validation_result["report_type"], df
+                                result = run_workflow(
+                                    st.session_state.processor,
+                                    validation_result["report_type"],
+                                    uploaded_file,
+                                    export_excel,
                                 )
 
                                 if result["success"]:
                                     st.success(f"✅ {file_name} processed successfully!")
+                                    show_save_status(st.session_state.processor)
 
                                     # Display summary
                                     st.subheader(f"Processing Summary - {file_name}")
@@ -590,8 +407,8 @@ def main():
 
                                     # Display preview data
                                     st.subheader(f"Data Preview - {file_name}")
-                                    preview_df = pd.DataFrame(result["data"])
-                                    st.dataframe(preview_df, use_container_width=True)
+                                    preview_df = result["data"]
+                                    st.dataframe(preview_df, height=400, use_container_width=True, hide_index=True)
 
                                 else:
                                     st.error(f"❌ Processing failed: {result['error']}")
@@ -611,24 +428,13 @@ def main():
                             """)
                             
                             # Show the actual columns in the file
-                            try:
-                                if uploaded_file.name.endswith(".csv"):
-                                    df = pd.read_csv(temp_path)
-                                else:
-                                    df = pd.read_excel(temp_path)
-                                
-                                st.info(f"**Columns found in your file:** {', '.join(df.columns)}")
-                            except:
-                                pass
+                            st.info(
+                                f"**Columns found in your file:** {', '.join(validation_result['columns'])}"
+                            )
 
                 except Exception as e:
                     st.error(f"❌ Error processing file: {str(e)}")
                     logger.error(f"Error in main: {str(e)}")
-
-                finally:
-                    # Clean up temp file
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
                 
                 # Add separator between files
                 if i < len(all_files) - 1:
@@ -640,8 +446,9 @@ def main():
         # Display processing history
         if st.session_state.processor.processed_reports:
             st.subheader("Processing History")
-            history_df = pd.DataFrame(st.session_state.processor.processed_reports)
+            history_df = st.session_state.processor.history_frame()
             st.dataframe(history_df, use_container_width=True)
+            show_save_status(st.session_state.processor)
 
     # Footer
     st.markdown("---")
@@ -2,6 +2,7 @@
 Pytest configuration and fixtures
 """
 
+import io
 import os
 import tempfile
 from pathlib import Path
@@ -10,9 +11,9 @@ import pandas as pd
 import pytest
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_rpt600_data():
-    """Sample RPT600 data for testing"""
+    """Sample RPT600 data for testing (shared by a module; do not mutate)"""
     return {
         "Payee": ["ASC001", "ASC002", "ASC003"],
         "Dealer": ["DLR001", "DLR002", "DLR001"],
@@ -24,9 +25,9 @@ def sample_rpt600_data():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_rpt908_data():
-    """Sample RPT908 data for testing"""
+    """Sample RPT908 data for testing (shared by a module; do not mutate)"""
     return {
         "Contract": ["CTR001", "CTR002", "CTR003"],
         "Cancellation_Reason": ["Customer Request", "Non-Payment", "Service Issue"],
@@ -37,9 +38,9 @@ def sample_rpt908_data():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def temp_csv_file(sample_rpt600_data):
-    """Create temporary CSV file for testing"""
+    """Create temporary CSV file for testing, written once per module"""
     with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as f:
         df = pd.DataFrame(sample_rpt600_data)
         df.to_csv(f.name, index=False)
@@ -47,9 +48,9 @@ def temp_csv_file(sample_rpt600_data):
         os.unlink(f.name)
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def temp_excel_file(sample_rpt600_data):
-    """Create temporary Excel file for testing"""
+    """Create temporary Excel file for testing, written once per module"""
     with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as f:
         df = pd.DataFrame(sample_rpt600_data)
         df.to_excel(f.name, index=False)
@@ -68,3 +69,38 @@ def output_directory():
 
     if output_dir.exists():
         shutil.rmtree(output_dir)
+
+
+@pytest.fixture
+def make_upload():
+    """Build Streamlit uploads holding a DataFrame as CSV or XLSX bytes"""
+    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+    def make(df, file_name="report.csv", file_id="upload"):
+        if file_name.endswith(".csv"):
+            data = df.to_csv(index=False).encode()
+        else:
+            buffer = io.BytesIO()
+            df.to_excel(buffer, index=False)
+            data = buffer.getvalue()
+        return UploadedFile(UploadedFileRec(file_id, file_name, "", data), None)
+
+    return make
+
+
+@pytest.fixture
+def spy(monkeypatch):
+    """Record the (args, kwargs) of calls to an attribute, still calling it"""
+
+    def wrap(target, name):
+        calls = []
+        original = getattr(target, name)
+
+        def recorder(*args, **kwargs):
+            calls.append((args, kwargs))
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(target, name, recorder)
+        return calls
+
+    return wrap
@@ -2,41 +2,34 @@
 Tests for the main Streamlit application
 """
 
+import copy
+import io
+import json
 import os
 import tempfile
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
 
+from src.app.config import config
 from src.app.main import ReportProcessor
 
 
 class TestReportProcessor:
     """Test cases for ReportProcessor class"""
 
-    def setup_method(self):
-        """Setup test fixtures"""
+    @pytest.fixture(autouse=True)
+    def setup(self, sample_rpt600_data, sample_rpt908_data):
+        """Give each test a fresh processor and its own copy of the sample data"""
         self.processor = ReportProcessor()
-
-        # Create sample data for testing
-        self.sample_rpt600_data = {
-            "Payee": ["ASC001", "ASC002"],
-            "Dealer": ["DLR001", "DLR002"],
-            "Commission": [100.00, 150.00],
-            "Date": ["2024-10-01", "2024-10-02"],
-        }
-
-        self.sample_rpt908_data = {
-            "Contract": ["CTR001", "CTR002"],
-            "Cancellation_Reason": ["Customer Request", "Non-Payment"],
-            "Refund_Amount": [50.00, 75.00],
-            "Date": ["2024-10-01", "2024-10-02"],
-        }
+        self.sample_rpt600_data = copy.deepcopy(sample_rpt600_data)
+        self.sample_rpt908_data = copy.deepcopy(sample_rpt908_data)
 
     def test_processor_initialization(self):
         """Test ReportProcessor initialization"""
-        assert self.processor.supported_reports == ["RPT600", "RPT908"]
+        assert ReportProcessor.SUPPORTED_REPORTS == ("RPT600", "RPT908")
         assert len(self.processor.processed_reports) == 0
 
     def test_detect_report_type_rpt600(self):
@@ -51,37 +44,93 @@ class TestReportProcessor:
         report_type = self.processor.detect_report_type(df)
         assert report_type == "RPT908"
 
-    def test_validate_report_csv(self):
-        """Test CSV file validation"""
-        # Create temporary CSV file
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as f:
-            df = pd.DataFrame(self.sample_rpt600_data)
-            df.to_csv(f.name, index=False)
-            temp_path = f.name
+    def test_detect_report_type_ambiguous(self):
+        """Test a tie between report indicators is not classified"""
+        df = pd.DataFrame(columns=["Payee", "Refund"])
+        assert self.processor.detect_report_type(df) is None
 
-        try:
-            result = self.processor.validate_report(temp_path)
-            assert result["valid"] is True
-            assert result["report_type"] == "RPT600"
-            assert result["row_count"] == 2
-        finally:
-            os.unlink(temp_path)
+    def test_detect_report_type_uses_full_score(self):
+        """Test a strong single indicator does not outvote the other report"""
+        columns = ["Payee", "Dealer", "Commission", "Fee", "Cancellation", "Refund"]
+        df = pd.DataFrame(columns=columns)
+        assert self.processor.detect_report_type(df) == "RPT600"
+
+    def test_detect_report_type_matches_within_columns(self):
+        """Test an indicator split across two column names does not count"""
+        df = pd.DataFrame(columns=["Payee", "Cancel", "lation", "Ref", "und"])
+        # Only "payee" and "cancel" match, so the two reports tie
+        assert self.processor.detect_report_type(df) is None
+
+    def test_detect_report_type_logs_without_streamlit(self, monkeypatch, caplog):
+        """Test detection reports its scores to the log, never to the UI"""
+        import logging
+
+        from src.app import main
+
+        class NoStreamlit:
+            def __getattr__(self, name):
+                raise AssertionError(f"detect_report_type used st.{name}")
+
+        monkeypatch.setattr(main, "st", NoStreamlit())
+        df = pd.DataFrame(self.sample_rpt908_data)
+        with caplog.at_level(logging.DEBUG, logger=main.logger.name):
+            assert self.processor.detect_report_type(df) == "RPT908"
 
-    def test_validate_report_excel(self):
+        assert "RPT908 score" in caplog.text
+
+    def test_validate_report_csv(self, temp_csv_file):
+        """Test CSV file validation"""
+        result = self.processor.validate_report(temp_csv_file)
+        assert result["valid"] is True
+        assert result["report_type"] == "RPT600"
+        assert result["row_count"] == 3
+
+    def test_validate_report_excel(self, temp_excel_file):
         """Test Excel file validation"""
-        # Create temporary Excel file
-        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as f:
-            df = pd.DataFrame(self.sample_rpt600_data)
-            df.to_excel(f.name, index=False)
-            temp_path = f.name
+        result = self.processor.validate_report(temp_excel_file)
+        assert result["valid"] is True
+        assert result["report_type"] == "RPT600"
+        assert result["row_count"] == 3
+
+    def test_validate_report_buffer(self):
+        """Test validation straight from an in-memory upload"""
+        buffer = io.BytesIO()
+        pd.DataFrame(self.sample_rpt908_data).to_csv(buffer, index=False)
+
+        result = self.processor.validate_report(buffer, "upload.csv")
+        assert result["valid"] is True
+        assert result["report_type"] == "RPT908"
+        assert result["row_count"] == 3
+
+    @pytest.mark.parametrize("file_name", ["upload.csv", "upload.xlsx"])
+    def test_validate_report_skips_full_read(self, monkeypatch, file_name):
+        """Test validation never parses the report body into a DataFrame"""
+        from src.app import main, utils
+
+        def full_read(*_args, **_kwargs):
+            raise AssertionError("validation parsed the full report")
+
+        monkeypatch.setattr(main, "read_report", full_read)
+        monkeypatch.setattr(utils, "read_report", full_read)
+        buffer = io.BytesIO()
+        df = pd.DataFrame(self.sample_rpt600_data)
+        if file_name.endswith(".csv"):
+            df.to_csv(buffer, index=False)
+        else:
+            df.to_excel(buffer, index=False)
 
-        try:
-            result = self.processor.validate_report(temp_path)
-            assert result["valid"] is True
-            assert result["report_type"] == "RPT600"
-            assert result["row_count"] == 2
-        finally:
-            os.unlink(temp_path)
+        result = self.processor.validate_report(buffer, file_name)
+        assert result["valid"] is True
+        assert result["row_count"] == 3
+
+    def test_validate_report_mislabeled(self):
+        """Test a workbook named .csv is rejected before parsing"""
+        buffer = io.BytesIO()
+        pd.DataFrame(self.sample_rpt908_data).to_excel(buffer, index=False)
+
+        result = self.processor.validate_report(buffer, "upload.csv")
+        assert result["valid"] is False
+        assert "XLSX" in result["error"]
 
     def test_process_rpt600(self):
         """Test RPT600 processing"""
@@ -89,10 +138,46 @@ class TestReportProcessor:
         result = self.processor.process_rpt600(df)
 
         assert result["success"] is True
-        assert result["summary"]["total_records"] == 2
-        assert result["summary"]["unique_payees"] == 2
+        assert result["summary"]["total_records"] == 3
+        assert result["summary"]["unique_payees"] == 3
         assert result["summary"]["unique_dealers"] == 2
-        assert result["summary"]["total_amount"] == 250.00
+        assert result["summary"]["total_amount"] == 450.00
+        assert isinstance(result["data"], pd.DataFrame)
+        assert result["data"]["Commission"].dtype == df["Commission"].dtype
+
+    def test_process_rpt600_numeric_header(self):
+        """Test a workbook column named by a number does not break the summary"""
+        df = pd.DataFrame(self.sample_rpt600_data).assign(**{"2024": [1, 2, 3]})
+        df = df.rename(columns={"2024": 2024})
+        result = self.processor.process_rpt600(df)
+
+        assert result["success"] is True
+        assert result["summary"]["total_amount"] == 450.00
+
+    def test_process_rpt600_ignores_missing_ids(self):
+        """Test blank payee/dealer cells are not counted as another ID"""
+        data = dict(self.sample_rpt600_data)
+        data["Payee"] = ["ASC001", None, "ASC001"]
+        data["Dealer"] = [None, None, None]
+        result = self.processor.process_rpt600(pd.DataFrame(data))
+
+        assert result["summary"]["unique_payees"] == 1
+        assert result["summary"]["unique_dealers"] == 0
+
+    @pytest.mark.parametrize("dtype", [object, "string[pyarrow]", "category"])
+    def test_process_rpt600_counts_ids_in_any_dtype(self, dtype):
+        """Test payee/dealer counts agree for object, Arrow and categorical IDs"""
+        df = pd.DataFrame(
+            {
+                "Payee": ["ASC001", "ASC002", "ASC001", None],
+                "Dealer": ["DLR001", None, "DLR001", None],
+                "Commission": [1.0, 2.0, 3.0, 4.0],
+            }
+        ).astype({"Payee": dtype, "Dealer": dtype})
+        summary = self.processor.process_rpt600(df)["summary"]
+
+        assert summary["unique_payees"] == 2
+        assert summary["unique_dealers"] == 1
 
     def test_process_rpt908(self):
         """Test RPT908 processing"""
@@ -100,9 +185,84 @@ class TestReportProcessor:
         result = self.processor.process_rpt908(df)
 
         assert result["success"] is True
-        assert result["summary"]["total_records"] == 2
-        assert result["summary"]["total_refund_amount"] == 125.00
+        assert result["summary"]["total_records"] == 3
+        assert result["summary"]["total_refund_amount"] == 225.00
         assert "Customer Request" in result["summary"]["cancellation_reasons"]
+        assert isinstance(result["data"], pd.DataFrame)
+
+    def test_preview_is_a_dataframe_slice(self, monkeypatch):
+        """Test the preview is the first rows as a DataFrame, not records"""
+        monkeypatch.setattr(ReportProcessor, "PREVIEW_ROWS", 1)
+        df = pd.DataFrame(self.sample_rpt908_data)
+        result = self.processor.process_rpt908(df)
+
+        pd.testing.assert_frame_equal(result["data"], df.head(1))
+        # The preview owns its rows rather than viewing the full report
+        assert not np.shares_memory(
+            result["data"]["Refund_Amount"].to_numpy(), df["Refund_Amount"].to_numpy()
+        )
+
+    def test_categorize(self):
+        """Test categorical identifiers summarize like plain columns"""
+        df = pd.DataFrame(self.sample_rpt908_data)
+        expected = self.processor.process_rpt908(df)["summary"]
+        categorized = self.processor.categorize(df.copy())
+
+        assert categorized["Cancellation_Reason"].dtype == "category"
+        assert categorized["Contract"].dtype == df["Contract"].dtype
+        assert self.processor.process_rpt908(categorized)["summary"] == expected
+
+    @pytest.mark.parametrize("fast_io", [True, False])
+    @pytest.mark.parametrize("file_name", ["r.csv", "r.xlsx"])
+    @pytest.mark.parametrize("report_type", ["RPT600", "RPT908"])
+    def test_aggregate_source_matches_in_memory(
+        self, monkeypatch, report_type, file_name, fast_io
+    ):
+        """Test projected/chunked aggregation matches a full load"""
+        monkeypatch.setattr(config, "CHUNK_SIZE", 1)
+        monkeypatch.setattr(config, "FAST_IO", fast_io)
+        data = (
+            self.sample_rpt600_data
+            if report_type == "RPT600"
+            else self.sample_rpt908_data
+        )
+        df = pd.DataFrame(data)
+        buffer = io.BytesIO()
+        if file_name.endswith(".csv"):
+            df.to_csv(buffer, index=False)
+        else:
+            df.to_excel(buffer, index=False)
+
+        streamed = self.processor._aggregate_source(report_type, buffer, file_name)
+        if report_type == "RPT600":
+            expected = self.processor.process_rpt600(df)
+        else:
+            expected = self.processor.process_rpt908(df)
+
+        assert streamed["success"] is True
+        assert streamed["summary"] == expected["summary"]
+        assert len(streamed["data"]) == 3
+
+    def test_stream_aggregate_falls_back_to_pandas(self, monkeypatch):
+        """Test a CSV the Arrow reader rejects mid-stream is re-read by pandas"""
+        from src.app import main
+
+        iter_report_chunks = main.iter_report_chunks
+
+        def arrow_fails(*args, fast_io=True, **kwargs):
+            chunks = iter_report_chunks(*args, fast_io=fast_io, **kwargs)
+            if fast_io:
+                yield next(chunks)
+                raise ValueError("CSV conversion error to int64")
+            yield from chunks
+
+        monkeypatch.setattr(config, "CHUNK_SIZE", 1)
+        monkeypatch.setattr(main, "iter_report_chunks", arrow_fails)
+        df = pd.DataFrame(self.sample_rpt600_data)
+        buffer = io.BytesIO(df.to_csv(index=False).encode())
+
+        streamed = self.processor._stream_aggregate("RPT600", buffer, "r.csv")
+        assert streamed["summary"] == self.processor.process_rpt600(df)["summary"]
 
     def test_execute_sop_workflow_rpt600(self):
         """Test SOP workflow for RPT600"""
@@ -124,6 +284,57 @@ class TestReportProcessor:
         assert self.processor.processed_reports[0]["report_type"] == "RPT908"
         assert self.processor.processed_reports[0]["status"] == "completed"
 
+    def test_execute_sop_workflow_background_save(self, monkeypatch, tmp_path):
+        """Test background saves return first and land once waited on"""
+        monkeypatch.setattr(config, "OUTPUT_DIRECTORY", str(tmp_path))
+        df = pd.DataFrame(self.sample_rpt908_data)
+        result = self.processor.execute_sop_workflow("RPT908", df, background=True)
+
+        assert result["success"] is True
+        self.processor.wait_for_saves(timeout=30)
+        assert self.processor.pending_saves() == 0
+        assert list(tmp_path.glob("RPT908_*_log.parquet"))
+        assert list(tmp_path.glob("RPT908_summary_*.json"))
+
+    def test_execute_sop_workflow_background_save_failure(self, monkeypatch):
+        """Test a failed background save is kept for the UI to report once"""
+
+        def disk_full(*_args, **_kwargs):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(self.processor, "_write_outputs", disk_full)
+        df = pd.DataFrame(self.sample_rpt908_data)
+        result = self.processor.execute_sop_workflow("RPT908", df, background=True)
+
+        assert result["success"] is True
+        self.processor.wait_for_saves(timeout=30)
+        assert self.processor.pending_saves() == 0
+        assert self.processor.take_failed_saves() == ["disk full"]
+        assert self.processor.take_failed_saves() == []
+
+    def test_processing_history_is_bounded(self, monkeypatch):
+        """Test old history is dropped and each log holds only its own run"""
+        monkeypatch.setattr(ReportProcessor, "MAX_HISTORY", 2)
+        processor = ReportProcessor()
+        df = pd.DataFrame(self.sample_rpt600_data)
+        for _ in range(3):
+            processor.execute_sop_workflow("RPT600", df)
+
+        output_dir = Path("processed_reports")
+        try:
+            assert len(processor.processed_reports) == 2
+            history = processor.history_frame()
+            assert len(history) == 2
+            assert processor.history_frame() is history
+            processor.execute_sop_workflow("RPT600", df)
+            assert processor.history_frame() is not history
+            for log_file in output_dir.glob("RPT600_*_log.parquet"):
+                assert len(pd.read_parquet(log_file)) == 1
+        finally:
+            import shutil
+
+            shutil.rmtree(output_dir, ignore_errors=True)
+
     def test_save_processed_data(self):
         """Test saving processed data"""
         df = pd.DataFrame(self.sample_rpt600_data)
@@ -135,6 +346,9 @@ class TestReportProcessor:
         # Check if output directory was created
         output_dir = Path("processed_reports")
         assert output_dir.exists()
+        assert list(output_dir.glob("RPT600_*_log.parquet"))
+        assert list(output_dir.glob("RPT600_summary_*.json"))
+        assert not list(output_dir.glob("*.xlsx"))
 
         # Clean up
         import shutil
@@ -142,6 +356,61 @@ class TestReportProcessor:
         if output_dir.exists():
             shutil.rmtree(output_dir)
 
+    def test_save_processed_data_recreates_removed_directory(self, tmp_path):
+        """Test the cached output directory is recreated after removal"""
+        import shutil
+
+        output_dir = tmp_path / "out"
+        df = pd.DataFrame(self.sample_rpt600_data)
+        result = self.processor.process_rpt600(df)
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(config, "OUTPUT_DIRECTORY", str(output_dir))
+            self.processor.save_processed_data("RPT600", df, result)
+            shutil.rmtree(output_dir)
+            self.processor.save_processed_data("RPT600", df, result)
+
+        assert list(output_dir.glob("RPT600_summary_*.json"))
+
+    def test_save_processed_data_excel_export(self):
+        """Test the optional XLSX export"""
+        df = pd.DataFrame(self.sample_rpt908_data)
+        result = self.processor.process_rpt908(df)
+
+        self.processor.save_processed_data("RPT908", df, result, export_excel=True)
+
+        output_dir = Path("processed_reports")
+        workbooks = list(output_dir.glob("RPT908_*.xlsx"))
+        assert len(workbooks) == 1
+        sheets = pd.read_excel(workbooks[0], sheet_name=None)
+        # Raw data goes to the Parquet sibling, not a workbook sheet
+        assert list(sheets) == ["Summary", "Processing_Log"]
+        assert list(output_dir.glob("RPT908_*[0-9].parquet"))
+
+        # Clean up
+        import shutil
+
+        if output_dir.exists():
+            shutil.rmtree(output_dir)
+
+    def test_save_processed_data_excel_raw_data(self, monkeypatch, tmp_path):
+        """Test every raw row reaches the workbook when Parquet is unavailable"""
+        from src.app import main
+
+        monkeypatch.setattr(main, "HAS_PYARROW", False)
+        monkeypatch.setattr(config, "OUTPUT_DIRECTORY", str(tmp_path))
+        df = pd.DataFrame(self.sample_rpt908_data)
+        result = self.processor.process_rpt908(df)
+
+        self.processor.save_processed_data("RPT908", df, result)
+
+        (workbook,) = tmp_path.glob("RPT908_*.xlsx")
+        raw = pd.read_excel(workbook, sheet_name="Raw_Data")
+        pd.testing.assert_frame_equal(raw, df, check_dtype=False)
+        (summary,) = tmp_path.glob("RPT908_summary_*.json")
+        assert json.loads(summary.read_text())["total_records"] == len(df)
+        assert not list(tmp_path.glob("*.parquet"))
+
     def test_error_handling_invalid_file(self):
         """Test error handling for invalid files"""
         result = self.processor.validate_report("nonexistent_file.csv")
@@ -172,3 +441,118 @@ def test_health_check():
         assert processor is not None
     except ImportError as e:
         pytest.fail(f"Failed to import main application: {e}")
+
+
+def test_load_upload_is_keyed_on_content(make_upload, spy):
+    """Test identical bytes reuse the parsed DataFrame and new bytes do not"""
+    from src.app import main
+
+    data = pd.DataFrame({"Payee": ["ASC001"], "Commission": [1.0]})
+    reads = spy(main, "read_report")
+    main._load_content.clear()
+
+    for file_id in ("first", "second"):
+        df = main.load_upload(ReportProcessor(), make_upload(data, file_id=file_id))
+
+    assert len(reads) == 1
+    assert len(df) == 1
+    # Identifier columns come back categorical, ready for code-based counts
+    assert df["Payee"].dtype == "category"
+
+    other = pd.DataFrame({"Payee": ["ASC001", "ASC002"]})
+    df = main.load_upload(ReportProcessor(), make_upload(other, file_id="third"))
+    assert len(reads) == 2
+    assert len(df) == 2
+
+
+def test_validate_upload_is_keyed_on_content(make_upload, spy):
+    """Test re-uploads of the same bytes reuse the validation result"""
+    from src.app import main
+
+    processor = ReportProcessor()
+    calls = spy(processor, "validate_report")
+    main._validate_content.clear()
+
+    data = pd.DataFrame({"Payee": ["ASC001"], "Commission": [1.0]})
+    for file_id in ("first", "second"):
+        result = main.validate_upload(processor, make_upload(data, file_id=file_id))
+
+    assert len(calls) == 1
+    assert result["report_type"] == "RPT600"
+
+
+def test_uploads_are_read_without_temp_files(make_upload, monkeypatch, tmp_path):
+    """Test validating and loading an upload writes nothing to disk"""
+    from src.app import main
+
+    upload = make_upload(
+        pd.DataFrame({"Payee": ["ASC001"], "Commission": [1.0]}), "report.xlsx"
+    )
+    monkeypatch.chdir(tmp_path)
+    main._validate_content.clear()
+    main._load_content.clear()
+
+    assert main.validate_upload(ReportProcessor(), upload)["valid"] is True
+    assert len(main.load_upload(ReportProcessor(), upload)) == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_loaded_amounts_keep_cent_precision(make_upload):
+    """Test money columns are not narrowed to a type that loses cents"""
+    from src.app import main
+
+    data = pd.DataFrame(
+        {"Payee": ["ASC001", "ASC002"], "Commission": [12345678.91, 0.01]}
+    )
+    processor = ReportProcessor()
+    df = main.load_upload(processor, make_upload(data, file_id="cents"))
+
+    total = processor.process_rpt600(df)["summary"]["total_amount"]
+    assert round(total, 2) == 12345678.92
+
+
+@pytest.mark.parametrize("file_name", ["report.csv", "report.xlsx"])
+def test_run_workflow_streams_only_large_csv(
+    make_upload, spy, monkeypatch, tmp_path, file_name
+):
+    """Test large CSVs are streamed and large workbooks are loaded and saved"""
+    from src.app import main
+
+    monkeypatch.setattr(config, "STREAM_THRESHOLD_MB", 0)
+    monkeypatch.setattr(config, "OUTPUT_DIRECTORY", str(tmp_path))
+    processor = ReportProcessor()
+    streamed = spy(processor, "_aggregate_source")
+    loaded = spy(main, "load_upload")
+    data = pd.DataFrame({"Payee": ["ASC001"], "Commission": [1.0]})
+
+    result = main.run_workflow(processor, "RPT600", make_upload(data, file_name))
+    processor.wait_for_saves(timeout=30)
+
+    assert result["success"] is True
+    is_csv = file_name.endswith(".csv")
+    assert (len(streamed), len(loaded)) == ((1, 0) if is_csv else (0, 1))
+    # Only loaded reports have raw data to save
+    assert bool(list(tmp_path.glob("RPT600_*[0-9].parquet"))) is not is_csv
+
+
+def test_load_upload_reuses_disk_cache(make_upload, spy, monkeypatch, tmp_path):
+    """Test a re-upload after the in-memory cache is gone skips parsing"""
+    from src.app import main
+
+    monkeypatch.setattr(config, "REPORT_CACHE_DIRECTORY", str(tmp_path))
+    reads = spy(main, "read_report")
+    data = pd.DataFrame({"Payee": ["ASC001"], "Commission": [1.0]})
+    upload = make_upload(data, file_id="cached")
+
+    frames = []
+    for _ in range(2):
+        # A new session or server restart starts with an empty memory cache
+        main._load_content.clear()
+        frames.append(main.load_upload(ReportProcessor(), upload))
+
+    assert len(reads) == 1
+    assert [path.suffix for path in tmp_path.iterdir()] == [".parquet"]
+    assert frames[1]["Payee"].dtype == "category"
+    pd.testing.assert_frame_equal(
+        frames[0].astype(object), frames[1].astype(object), check_dtype=False
+    )
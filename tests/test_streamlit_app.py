@@ -0,0 +1,255 @@
+"""
+Tests for the Streamlit Cloud entry point
+"""
+
+import os
+import random
+
+import pandas as pd
+import pytest
+
+import streamlit_app as cloud
+
+
+def no_pool(*_args, **_kwargs):
+    raise AssertionError("work that needs no threads used a thread pool")
+
+
+def original_scores(columns):
+    """The Cloud app's original per-column detection scoring, for reference"""
+    columns = [col.lower() for col in columns]
+    rpt600_indicators = [
+        "payee", "commission", "dealer", "fee", "amount", "payment",
+        "earnings", "compensation", "bonus", "incentive", "revenue",
+        "payee number", "dealer number", "agent", "representative",
+    ]  # fmt: skip
+    rpt908_indicators = [
+        "cancellation", "cancel", "termination", "refund", "contract",
+        "policy", "agreement", "discontinuation", "cessation", "end date",
+        "cancellation reason", "termination reason", "refund amount",
+        "cancellation date", "termination date",
+    ]  # fmt: skip
+
+    rpt600_score = 0
+    rpt908_score = 0
+    for col in columns:
+        for indicator in rpt600_indicators:
+            if indicator in col or col in indicator:
+                rpt600_score += 1
+        for indicator in rpt908_indicators:
+            if indicator in col or col in indicator:
+                rpt908_score += 1
+
+    if any("payee" in col for col in columns):
+        rpt600_score += 2
+    if any("commission" in col for col in columns):
+        rpt600_score += 2
+    if any("cancellation" in col for col in columns):
+        rpt908_score += 2
+    if any("refund" in col for col in columns):
+        rpt908_score += 2
+    return rpt600_score, rpt908_score
+
+
+# Column-name fragments for generated schemas: indicators, pieces of them,
+# and unrelated words, glued with the separators real headers use
+_FRAGMENTS = [
+    "Payee", "payee number", "Commission", "Dealer", "Fee", "Amount", "agent",
+    "Cancellation", "Cancel", "Termination", "Refund", "Contract", "Policy",
+    "end date", "Reason", "Date", "State", "Product", "pay", "ee", "can",
+    "cel", "lation", "Zip", "ID", "",
+]  # fmt: skip
+
+
+def random_schema(rng):
+    """A list of 1-8 column names built from one to three fragments each"""
+    return [
+        rng.choice(["", "_", " "]).join(rng.sample(_FRAGMENTS, rng.randint(1, 3)))
+        for _ in range(rng.randint(1, 8))
+    ]
+
+
+@pytest.fixture
+def processor(monkeypatch, tmp_path):
+    """Cloud processor saving into a temporary directory"""
+    monkeypatch.setattr(cloud.config, "OUTPUT_DIRECTORY", str(tmp_path))
+    processor = cloud.ReportProcessor()
+    yield processor
+    processor.wait_for_saves(timeout=30)
+
+
+@pytest.fixture
+def reports(make_upload, sample_rpt600_data, sample_rpt908_data):
+    """Build (name, upload) batch entries from report types"""
+    frames = {
+        "RPT600": pd.DataFrame(sample_rpt600_data),
+        "RPT908": pd.DataFrame(sample_rpt908_data),
+        "Unknown": pd.DataFrame({"Zip": ["85001"]}),
+    }
+
+    def make(*entries):
+        # upload_digest is cached per file ID, so an ID must name one content
+        return [
+            (name, make_upload(frames[kind], name, file_id=f"{kind}/{name}"))
+            for name, kind in entries
+        ]
+
+    return make
+
+
+def test_run_batch_keeps_upload_order(processor, reports, monkeypatch):
+    """Test concurrent batch rows come back in upload order"""
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    files = reports(
+        ("a.csv", "RPT600"),
+        ("b.xlsx", "RPT908"),
+        ("c.xlsx", "RPT600"),
+        ("d.csv", "RPT908"),
+    )
+
+    rows = cloud.run_batch(processor, files)
+
+    assert [row["File"] for row in rows] == ["a.csv", "b.xlsx", "c.xlsx", "d.csv"]
+    assert [row["Type"] for row in rows] == ["RPT600", "RPT908", "RPT600", "RPT908"]
+    assert all(row["Status"] == "✅ Success" for row in rows)
+    assert len(processor.processed_reports) == 4
+
+
+def test_run_batch_failures_become_rows(processor, reports, monkeypatch):
+    """Test a failing upload is reported in its row and the rest still run"""
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    run_workflow = cloud.run_workflow
+
+    def flaky(processor, report_type, uploaded_file, *args):
+        if uploaded_file.name == "broken.csv":
+            raise OSError("disk full")
+        return run_workflow(processor, report_type, uploaded_file, *args)
+
+    monkeypatch.setattr(cloud, "run_workflow", flaky)
+    files = reports(
+        ("good.csv", "RPT600"), ("unknown.csv", "Unknown"), ("broken.csv", "RPT908")
+    )
+
+    rows = cloud.run_batch(processor, files)
+
+    assert [row["Status"] for row in rows] == [
+        "✅ Success",
+        "❌ Validation Failed",
+        "❌ Error",
+    ]
+    assert rows[2]["Message"] == "disk full"
+    assert rows[2]["Records"] == 0
+
+
+def test_run_batch_single_upload_runs_serially(processor, reports, monkeypatch):
+    """Test one upload is processed in the script thread, without a pool"""
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    monkeypatch.setattr(cloud, "ThreadPoolExecutor", no_pool)
+
+    rows = cloud.run_batch(processor, reports(("a.csv", "RPT600")))
+
+    assert rows[0]["Status"] == "✅ Success"
+    assert rows[0]["Records"] == 3
+
+
+def test_validate_uploads_reuses_session_results(processor, reports, spy, monkeypatch):
+    """Test a rerun validates only new uploads and skips the pool when none are"""
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    calls = spy(cloud, "validate_upload")
+    files = reports(("a.csv", "RPT600"), ("b.csv", "RPT908"), ("c.csv", "Unknown"))
+    uploads = [upload for _, upload in files]
+
+    first = cloud.validate_uploads(processor, uploads)
+    assert [result.get("report_type") for result in first] == ["RPT600", "RPT908", None]
+    assert len(calls) == 3
+
+    monkeypatch.setattr(cloud, "ThreadPoolExecutor", no_pool)
+    assert cloud.validate_uploads(processor, uploads[::-1]) == first[::-1]
+    assert len(calls) == 3
+
+    # Removed uploads are forgotten; a single new one is validated in place
+    (_, new), *_ = reports(("d.csv", "RPT600"))
+    results = cloud.validate_uploads(processor, [uploads[0], new])
+    assert [result["report_type"] for result in results] == ["RPT600", "RPT600"]
+    assert len(calls) == 4
+    assert len(processor.upload_validations) == 2
+
+
+@pytest.mark.parametrize(
+    "columns",
+    [
+        ["Payee", "Dealer", "Commission", "Date"],
+        ["Contract", "Cancellation_Reason", "Refund_Amount", "Date"],
+        ["Payee Number", "Cancellation Date", "Refund Amount"],
+        ["pay", "ee", "Cancel", "lation"],
+        ["fee", "end date", "Policy"],
+        ["Zip", "ID", ""],
+    ],
+)
+def test_indicator_scores_match_original(columns):
+    """Test the cached scoring equals the original per-column loop"""
+    assert cloud._indicator_scores(tuple(columns)) == original_scores(columns)
+
+
+def test_indicator_scores_match_original_on_random_schemas():
+    """Test generated schemas score the same as with the original loop"""
+    rng = random.Random(0)
+    for _ in range(500):
+        columns = random_schema(rng)
+        assert cloud._indicator_scores(tuple(columns)) == original_scores(columns)
+
+
+@pytest.mark.parametrize(
+    "columns, expected",
+    [
+        (["Payee", "Dealer", "Commission", "Date"], "RPT600"),
+        (["Contract", "Cancellation_Reason", "Refund_Amount", "Date"], "RPT908"),
+        # "payee" and "refund" score 2 + 2 bonus each: a tie is not classified
+        (["Payee", "Refund"], None),
+        # One indicator each, but only "commission" earns bonus points
+        (["Commission", "Contract"], "RPT600"),
+        (["Payee", "Dealer", "Commission", "Fee", "Cancellation", "Refund"], None),
+        (["Zip", "State"], None),
+        # Workbook headers can be numbers
+        ([2024, "Payee"], "RPT600"),
+    ],
+)
+def test_detect_report_type(columns, expected):
+    """Test the Cloud app's detection, including ties and bonus points"""
+    df = pd.DataFrame(columns=columns)
+    assert cloud.ReportProcessor().detect_report_type(df) == expected
+
+
+def test_bonus_indicator_must_be_within_one_column():
+    """Test a bonus word split across two column names earns no bonus"""
+    split = cloud._indicator_scores(("Pay", "ee"))
+    per_column = [cloud._column_scores(name) for name in ("pay", "ee")]
+    assert split == tuple(map(sum, zip(*per_column)))
+    assert cloud._indicator_scores(("Payee",))[0] == 4
+
+
+def test_detect_report_type_is_cached_per_schema():
+    """Test repeated detection of a schema reuses the cached scores"""
+    columns = ["Payee", "Commission", "Cached_Schema_Column"]
+    processor = cloud.ReportProcessor()
+    processor.detect_report_type(pd.DataFrame(columns=columns))
+    hits = cloud._indicator_scores.cache_info().hits
+
+    processor.detect_report_type(pd.DataFrame({col: [1] for col in columns}))
+    assert cloud._indicator_scores.cache_info().hits == hits + 1
+
+
+def test_detect_report_type_logs_without_streamlit(monkeypatch, caplog):
+    """Test detection reports its scores to the log, never to the UI"""
+
+    class NoStreamlit:
+        def __getattr__(self, name):
+            raise AssertionError(f"detect_report_type used st.{name}")
+
+    monkeypatch.setattr(cloud, "st", NoStreamlit())
+    monkeypatch.setattr(cloud.app, "st", NoStreamlit())
+    df = pd.DataFrame(columns=["Contract", "Refund_Amount"])
+    with caplog.at_level("DEBUG", logger=cloud.logger.name):
+        assert cloud.ReportProcessor().detect_report_type(df) == "RPT908"
+
+    assert "RPT908 score" in caplog.text
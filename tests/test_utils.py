@@ -0,0 +1,255 @@
+"""
+Tests for utility functions
+"""
+
+import io
+import logging
+import os
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.app.utils import (
+    HAS_CALAMINE,
+    HAS_PYARROW,
+    count_report_rows,
+    date_bounds,
+    format_currency,
+    inspect_report,
+    iter_report_chunks,
+    load_cached_report,
+    load_processing_summary,
+    parse_dates,
+    read_report,
+    read_report_header,
+    sanitize_filename,
+    save_processing_summary,
+    setup_logging,
+    sniff_report_format,
+    store_cached_report,
+    sum_amounts,
+)
+
+
+def test_setup_logging_is_idempotent():
+    """Test repeated setup does not attach more handlers"""
+    setup_logging()
+    handlers = list(logging.getLogger().handlers)
+    setup_logging()
+    assert logging.getLogger().handlers == handlers
+
+
+@pytest.mark.parametrize("fast_io", [True, False])
+def test_read_report_header_csv(temp_csv_file, fast_io):
+    """Test reading only the CSV header"""
+    header = read_report_header(temp_csv_file, fast_io=fast_io)
+    assert header.empty
+    assert list(header.columns)[:3] == ["Payee", "Dealer", "Commission"]
+
+
+@pytest.mark.parametrize("fast_io", [True, False])
+def test_read_report_header_excel(temp_excel_file, fast_io):
+    """Test reading only the Excel header"""
+    header = read_report_header(temp_excel_file, fast_io=fast_io)
+    assert header.empty
+    assert list(header.columns)[:3] == ["Payee", "Dealer", "Commission"]
+
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="needs pyarrow")
+def test_read_report_csv_arrow_backed(temp_csv_file):
+    """Test fast CSV reads use the Arrow engine and dtypes, previews do not"""
+    df = read_report(temp_csv_file)
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+    assert df["Commission"].sum() == 450.00
+
+    # The Arrow engine cannot stop early, so row-limited reads use the C parser
+    preview = read_report(temp_csv_file, nrows=2)
+    assert len(preview) == 2
+    assert not isinstance(preview["Commission"].dtype, pd.ArrowDtype)
+
+
+@pytest.mark.skipif(
+    not (HAS_CALAMINE and HAS_PYARROW), reason="needs python-calamine and pyarrow"
+)
+def test_read_report_excel_arrow_backed(temp_excel_file):
+    """Test fast workbook reads use Arrow-backed dtypes"""
+    df = read_report(temp_excel_file)
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+    assert df["Commission"].sum() == 450.00
+
+
+def test_read_report_excel_engine(temp_excel_file, monkeypatch, spy):
+    """Test workbooks are read with calamine and fall back to openpyxl"""
+    from src.app import utils
+
+    calls = spy(pd, "read_excel")
+
+    expected = read_report(temp_excel_file, fast_io=False)
+    if HAS_CALAMINE:
+        pd.testing.assert_frame_equal(
+            read_report(temp_excel_file).astype(object),
+            expected.astype(object),
+            check_dtype=False,
+        )
+    monkeypatch.setattr(utils, "HAS_CALAMINE", False)
+    pd.testing.assert_frame_equal(read_report(temp_excel_file), expected)
+
+    engines = [kwargs.get("engine") for _, kwargs in calls]
+    assert engines == ([None, "calamine", None] if HAS_CALAMINE else [None, None])
+
+
+@pytest.mark.parametrize("fast_io", [True, False])
+def test_count_report_rows(temp_csv_file, temp_excel_file, fast_io):
+    """Test row counting without parsing the body"""
+    assert count_report_rows(temp_csv_file, fast_io=fast_io) == 3
+    assert count_report_rows(temp_excel_file, fast_io=fast_io) == 3
+
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="needs pyarrow")
+def test_iter_report_chunks_arrow(temp_csv_file):
+    """Test Arrow chunks hold the same rows as pandas' chunked reader"""
+    kwargs = {"usecols": ["Payee", "Commission"], "dtype": {"Payee": "category"}}
+    fast = list(iter_report_chunks(temp_csv_file, 2, **kwargs))
+    slow = list(iter_report_chunks(temp_csv_file, 2, fast_io=False, **kwargs))
+
+    assert [len(chunk) for chunk in fast] == [2, 1]
+    assert fast[0]["Payee"].dtype == "category"
+    assert isinstance(fast[0]["Commission"].dtype, pd.ArrowDtype)
+    pd.testing.assert_frame_equal(
+        pd.concat(fast, ignore_index=True).astype(object),
+        pd.concat(slow, ignore_index=True).astype(object),
+    )
+
+
+def test_sniff_report_format(temp_csv_file, temp_excel_file):
+    """Test the format comes from file content, not the name"""
+    assert sniff_report_format(temp_csv_file) == "csv"
+    assert sniff_report_format(temp_excel_file) == "xlsx"
+    with open(temp_excel_file, "rb") as f:
+        assert sniff_report_format(io.BytesIO(f.read())) == "xlsx"
+
+
+@pytest.mark.parametrize("fast_io", [True, False])
+def test_inspect_report(temp_csv_file, temp_excel_file, fast_io):
+    """Test header and row count come back together"""
+    for path in (temp_csv_file, temp_excel_file):
+        header, row_count = inspect_report(path, fast_io=fast_io)
+        assert header.columns.equals(read_report_header(path).columns)
+        assert row_count == 3
+
+
+@pytest.mark.parametrize("fast_io", [True, False])
+def test_readers_accept_path_objects(temp_csv_file, temp_excel_file, fast_io):
+    """Test pathlib paths read the same as string paths"""
+    for path in (temp_csv_file, temp_excel_file):
+        expected = read_report(path, fast_io=fast_io)
+        pd.testing.assert_frame_equal(
+            read_report(Path(path), fast_io=fast_io), expected
+        )
+        assert count_report_rows(Path(path), fast_io=fast_io) == 3
+        assert sniff_report_format(Path(path)) == sniff_report_format(path)
+
+    chunks = list(iter_report_chunks(Path(temp_csv_file), 2, fast_io=fast_io))
+    assert sum(len(chunk) for chunk in chunks) == 3
+
+
+def test_count_report_rows_without_trailing_newline():
+    """Test the last CSV line is counted when it has no newline"""
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as f:
+        f.write("Payee,Commission\nASC001,100\nASC002,150")
+        temp_path = f.name
+
+    try:
+        assert count_report_rows(temp_path) == 2
+    finally:
+        os.unlink(temp_path)
+
+
+@pytest.mark.parametrize("has_orjson", [True, False])
+def test_processing_summary_round_trip(output_directory, monkeypatch, has_orjson):
+    """Test summaries with numpy values and non-string keys round-trip"""
+    from src.app import utils
+
+    monkeypatch.setattr(utils, "HAS_ORJSON", has_orjson)
+    summary = {
+        "total_records": np.int64(3),
+        "total_refund_amount": np.float64(225.0),
+        "cancellation_reasons": {"Customer Request": 2, 7: 1},
+        # Not JSON serializable, so written through the str fallback
+        "total_amount": Decimal("225.50"),
+    }
+
+    summary_file = save_processing_summary(
+        output_directory, "RPT908", summary, "20241001_000000"
+    )
+    loaded = load_processing_summary(summary_file)
+
+    assert loaded["total_records"] == 3
+    assert loaded["total_refund_amount"] == 225.0
+    assert loaded["cancellation_reasons"] == {"Customer Request": 2, "7": 1}
+    assert loaded["total_amount"] == "225.50"
+
+
+def test_cached_report_round_trip(tmp_path):
+    """Test cached reports read back, and unreadable entries are misses"""
+    df = pd.DataFrame({"Payee": ["ASC001", "ASC002"], "Commission": [1.5, None]})
+    assert load_cached_report(tmp_path, "abc") is None
+
+    store_cached_report(tmp_path / "cache", "abc", df)
+    pd.testing.assert_frame_equal(load_cached_report(tmp_path / "cache", "abc"), df)
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == ["abc.parquet"]
+
+    (tmp_path / "cache" / "abc.parquet").write_bytes(b"not parquet")
+    assert load_cached_report(tmp_path / "cache", "abc") is None
+
+
+def test_parse_dates_sniffs_format():
+    """Test dates parse with the sniffed format and stragglers still parse"""
+    values = pd.Series(["10/01/2024", None, "10/03/2024", "2024-10-05", "n/a"])
+    parsed = parse_dates(values)
+
+    assert parsed.iloc[0] == pd.Timestamp("2024-10-01")
+    assert parsed.iloc[3] == pd.Timestamp("2024-10-05")
+    assert parsed.isna().tolist() == [False, True, False, False, True]
+
+
+def test_date_bounds():
+    """Test the earliest/latest dates skip blanks and keep the time unit"""
+    values = pd.Series(["10/03/2024", None, "10/01/2024", "n/a"])
+    assert date_bounds(values) == (
+        pd.Timestamp("2024-10-01"),
+        pd.Timestamp("2024-10-03"),
+    )
+    assert all(pd.isna(bound) for bound in date_bounds(pd.Series([None, "n/a"])))
+
+    seconds = pd.Series(pd.to_datetime(["2024-10-01 12:30", "2024-09-30 00:00"]))
+    assert date_bounds(seconds.dt.as_unit("s"))[1] == pd.Timestamp("2024-10-01 12:30")
+    aware = seconds.dt.tz_localize("UTC")
+    assert date_bounds(aware)[0] == pd.Timestamp("2024-09-30", tz="UTC")
+
+
+def test_sanitize_filename():
+    """Test unsafe characters are replaced and length is capped"""
+    assert sanitize_filename("RPT908:10/2024?.csv") == "RPT908_10_2024_.csv"
+    assert len(sanitize_filename("a" * 300)) == 255
+
+
+def test_format_currency():
+    """Test currency formatting of Python and numpy values"""
+    assert format_currency(1234567.891) == "$1,234,567.89"
+    assert format_currency(np.float64(250)) == "$250.00"
+    assert format_currency(np.int64(-5)) == "$-5.00"
+    assert format_currency(None) == "$0.00"
+    assert format_currency("n/a") == "$0.00"
+
+
+def test_sum_amounts():
+    """Test money columns sum as numbers whatever their dtype"""
+    assert sum_amounts(pd.Series([100.0, 150.0, None])) == 250.0
+    assert sum_amounts(pd.Series(["$1,234.50", " 100 ", None, "n/a"])) == 1334.5
+    assert sum_amounts(pd.Series(["5", "6"], dtype="category")) == 11.0
+    assert isinstance(sum_amounts(pd.Series([1, 2])), float)